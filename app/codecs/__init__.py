@@ -1 +1,2 @@
 from .object_id_codec import ObjectIdCodec
+from .json_response import MongoJSONResponse, dumps_document, loads_document
@@ -0,0 +1,44 @@
+import json
+from typing import Any
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.codecs.object_id_codec import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, BaseModel):
+        return o.dict(by_alias=True)
+    raise TypeError
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    JSON response that serializes database documents as they are, ObjectId and datetime included.
+    Uses orjson when installed and the stdlib encoder otherwise.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_document(content)
+
+
+def dumps_document(content: Any) -> bytes:
+    """ Serialize a database document or a list of them to json bytes. """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, cls=JSONEncoder, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def loads_document(raw: bytes) -> Any:
+    """ Parse json bytes, raise ValueError when they are not valid json. """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
@@ -1,5 +1,7 @@
 import json
+from datetime import date, datetime
 from bson.objectid import ObjectId
+from pydantic import BaseModel
 
 
 class ObjectIdCodec(ObjectId):
@@ -22,4 +24,8 @@ class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, ObjectId):
             return str(o)
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, BaseModel):
+            return o.dict(by_alias=True)
         return json.JSONEncoder.default(self, o)
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic import BaseSettings, Field
 
 
@@ -8,9 +9,54 @@ class Settings(BaseSettings):
 
     MONGO_URL: str = Field(env="MONGO_URL", default="mongodb://localhost:27017/", description="The url of the MongoDB")
     DEFAULT_DATABASE: str = Field(env="DEFAULT_DATABASE", default="your_database", description="Default database name")
+    MONGO_MAX_POOL_SIZE: int = Field(env="MONGO_MAX_POOL_SIZE", default=100, gt=0, description="Maximum connections per worker")
+    MONGO_MIN_POOL_SIZE: int = Field(env="MONGO_MIN_POOL_SIZE", default=0, ge=0, description="Connections kept open per worker, opened at startup")
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = Field(env="MONGO_WAIT_QUEUE_TIMEOUT_MS", default=None, gt=0, description="Milliseconds to wait for a free connection, no limit by default")
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = Field(env="MONGO_SERVER_SELECTION_TIMEOUT_MS", default=30000, gt=0, description="Milliseconds to wait for a suitable server")
+    MONGO_READ_PREFERENCE: str = Field(env="MONGO_READ_PREFERENCE", default="primary", description="primary, primaryPreferred, secondary, secondaryPreferred or nearest")
+    ENSURE_INDEXES: bool = Field(env="ENSURE_INDEXES", default=True, description="Create the missing repositories indexes at startup, changed ones are rebuilt by python -m app.repositories.indexes")
+    MONGO_WARM_UP: bool = Field(env="MONGO_WARM_UP", default=True, description="Open the minimum pool connections at startup")
     ENABLE_ADMIN: bool = Field(env="ENABLE_ADMIN", default=True)
+    OPENAPI_SCHEMA_FILE: Optional[str] = Field(env="OPENAPI_SCHEMA_FILE", default=None, description="Prebuilt schema written by python -m app.openapi, generated on the first request when unset")
+    ENABLE_METRICS: bool = Field(env="ENABLE_METRICS", default=True, description="Record request and MongoDB command metrics served on /metrics")
+    VALIDATE_RESPONSES: bool = Field(env="VALIDATE_RESPONSES", default=True, description="Validate documents read from the database against the response models, disable to serve them as stored")
+    COMPRESSION_MINIMUM_SIZE: int = Field(env="COMPRESSION_MINIMUM_SIZE", default=1000, ge=0, description="Smallest response body in bytes worth compressing")
+    COMPRESSION_ENCODINGS: List[str] = Field(env="COMPRESSION_ENCODINGS", default=["br", "zstd", "gzip"], description="Accepted encodings by server preference, br and zstd need the brotli and zstandard packages")
+    COMPRESSION_LEVELS: Dict[str, Dict[str, int]] = Field(env="COMPRESSION_LEVELS", default={
+        "application/json": {"br": 4, "zstd": 3, "gzip": 6},
+        "application/x-ndjson": {"br": 1, "zstd": 1, "gzip": 1},
+        "text/csv": {"br": 1, "zstd": 1, "gzip": 1},
+    }, description="Compression level by content type and encoding, a * content type sets the fallback")
+    COMPRESSION_CACHE_SIZE: int = Field(env="COMPRESSION_CACHE_SIZE", default=256, ge=0, description="Compressed bodies kept by ETag for unchanged responses, 0 disables the cache")
     API_TOKEN: str = Field(env="API_TOKEN", default="your_token", description="The token for the API")
 
+    HASHER_MAX_WORKERS: int = Field(env="HASHER_MAX_WORKERS", default=2, gt=0, description="Threads used to run bcrypt off the event loop")
+    AUTH_CACHE_MAX_SIZE: int = Field(env="AUTH_CACHE_MAX_SIZE", default=1024, ge=0, description="Verified credentials kept in memory, 0 disables the cache")
+    AUTH_CACHE_TTL: float = Field(env="AUTH_CACHE_TTL", default=30, ge=0, description="Seconds a verified credential is trusted without bcrypt")
+
+    DOCUMENT_CACHE_MAX_SIZE: int = Field(env="DOCUMENT_CACHE_MAX_SIZE", default=0, ge=0, description="Documents cached per repository by get_by_id, 0 disables the cache")
+    DOCUMENT_CACHE_TTL: float = Field(env="DOCUMENT_CACHE_TTL", default=5, gt=0, description="Seconds a cached document is served before it is read again")
+
+    BATCH_BY_ID_LOOKUPS: bool = Field(env="BATCH_BY_ID_LOOKUPS", default=True, description="Merge the get_by_id calls of one event loop tick into a single $in query")
+    BATCH_MAX_SIZE: int = Field(env="BATCH_MAX_SIZE", default=1000, gt=0, description="Ids per batched $in query")
+
+    WRITE_COALESCING: bool = Field(env="WRITE_COALESCING", default=False, description="Group the concurrent single creates of a collection into unordered insert_many calls")
+    WRITE_COALESCING_MAX_DELAY_MS: float = Field(env="WRITE_COALESCING_MAX_DELAY_MS", default=2, ge=0, description="Milliseconds a create waits for others before its batch is written")
+    WRITE_COALESCING_MAX_BATCH_SIZE: int = Field(env="WRITE_COALESCING_MAX_BATCH_SIZE", default=100, gt=0, description="Creates per batch, a full batch is written at once")
+
+    BULK_IMPORT_CHUNK_SIZE: int = Field(env="BULK_IMPORT_CHUNK_SIZE", default=1000, gt=0, description="Rows validated and inserted per insert_many by the bulk import routes")
+    BULK_IMPORT_MAX_LINE_SIZE: int = Field(env="BULK_IMPORT_MAX_LINE_SIZE", default=1048576, gt=0, description="Bytes of a bulk import line, longer lines fail without being buffered")
+
+    RATE_LIMIT_BACKEND: str = Field(env="RATE_LIMIT_BACKEND", default="memory", description="Token buckets of the client and identifier headers kept per worker (memory), shared in MongoDb (mongo) or none")
+    RATE_LIMIT_RATE: float = Field(env="RATE_LIMIT_RATE", default=10, gt=0, description="Requests per second granted to each client and identifier")
+    RATE_LIMIT_BURST: int = Field(env="RATE_LIMIT_BURST", default=20, gt=0, description="Requests a client and identifier can make at once after being idle")
+    RATE_LIMIT_MAX_KEYS: int = Field(env="RATE_LIMIT_MAX_KEYS", default=10000, gt=0, description="Buckets kept per worker by the memory backend, least recently used first out")
+    LOAD_SHEDDING_MAX_IN_FLIGHT: int = Field(env="LOAD_SHEDDING_MAX_IN_FLIGHT", default=500, ge=0, description="Requests served at once by a worker before new ones get a 503, 0 disables the limit")
+    LOAD_SHEDDING_MAX_POOL_WAITING: int = Field(env="LOAD_SHEDDING_MAX_POOL_WAITING", default=100, ge=0, description="Operations waiting for a MongoDb connection before new requests get a 503, 0 disables the limit")
+    LOAD_SHEDDING_RETRY_AFTER: int = Field(env="LOAD_SHEDDING_RETRY_AFTER", default=1, gt=0, description="Seconds sent in the Retry-After header of shed requests")
+
+    SEARCH_BACKEND: str = Field(env="SEARCH_BACKEND", default="auto", description="Text search with the MongoDb text index, the in process index, or auto to fall back to it when $text is unsupported")
+
     class Config:
         validate_assignment = True
         case_sensitive = True
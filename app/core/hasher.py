@@ -1,13 +1,96 @@
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
 
-_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+_executor = ThreadPoolExecutor(max_workers=settings.HASHER_MAX_WORKERS, thread_name_prefix="hasher")
+
+
+class VerifiedCredentialCache(object):
+    """
+    Bounded LRU of credentials that recently passed bcrypt, entries expire after ttl seconds.
+    Only an HMAC of the credentials with a per process random key is kept, never the password.
+    """
+    __slots__ = ['max_size', 'ttl', '_key', '_entries']
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._key: bytes = secrets.token_bytes(32)
+        self._entries: OrderedDict = OrderedDict()
+
+    def _digest(self, plain_password: str, hashed_password: str) -> bytes:
+        message = plain_password.encode() + b"\0" + hashed_password.encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def contains(self, plain_password: str, hashed_password: str) -> bool:
+        """ Check if the credentials were verified less than ttl seconds ago. """
+        if self.max_size <= 0 or self.ttl <= 0:
+            return False
+        digest = self._digest(plain_password, hashed_password)
+        expires_at = self._entries.get(digest)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._entries[digest]
+            return False
+        self._entries.move_to_end(digest)
+        return True
+
+    def add(self, plain_password: str, hashed_password: str):
+        """ Remember successfully verified credentials, evicting the least recently used entry when full. """
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        digest = self._digest(plain_password, hashed_password)
+        self._entries[digest] = time.monotonic() + self.ttl
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Forget every verified credential. """
+        self._entries.clear()
+
+
+verified_cache = VerifiedCredentialCache(settings.AUTH_CACHE_MAX_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def _context():
+    """ Build the passlib context on first use, importing passlib only when a password is handled. """
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 
 class Hasher:
     @staticmethod
     def verify_password(plain_password, hashed_password):
-        return _pwd_context.verify(plain_password, hashed_password)
+        return _context().verify(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password):
-        return _pwd_context.hash(password)
+        return _context().hash(password)
+
+    @staticmethod
+    async def verify_password_async(plain_password, hashed_password):
+        """ Verify in the hasher pool so bcrypt does not block the event loop, recent successes skip bcrypt. """
+        if verified_cache.contains(plain_password, hashed_password):
+            return True
+        loop = asyncio.get_running_loop()
+        verified = await loop.run_in_executor(_executor, _context().verify, plain_password, hashed_password)
+        if verified:
+            verified_cache.add(plain_password, hashed_password)
+        return verified
+
+    @staticmethod
+    async def get_password_hash_async(password):
+        """ Hash in the hasher pool so bcrypt does not block the event loop. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, _context().hash, password)
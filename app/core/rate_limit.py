@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+from app.repositories.rate_limit_repository import RateLimitRepository
+from app.storages.database_storage import Database
+
+
+class RateLimitBackend(object):
+    """ Token buckets by key, each one refills at `rate` tokens per second up to `burst` tokens. """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate: float = rate
+        self.burst: int = burst
+
+    async def take(self, key: str, db: Database) -> float:
+        """ Take a token of the key, return 0 when allowed otherwise the seconds to wait for the next one. """
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets kept in process, the least recently used ones are dropped beyond max_keys.
+    Each worker has its own buckets, so a client gets up to `rate` requests per second from every worker.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        super().__init__(rate, burst)
+        self.max_keys: int = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def take(self, key: str, db: Database) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1 if wait == 0.0 else tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """ Buckets stored in MongoDb and shared by every worker, at the cost of one upsert per request. """
+
+    def __init__(self, rate: float, burst: int):
+        super().__init__(rate, burst)
+        self._repo = RateLimitRepository()
+
+    async def take(self, key: str, db: Database) -> float:
+        return await self._repo.take(key, self.rate, self.burst, db)
+
+
+rate_limiter: Optional[RateLimitBackend] = None
+
+
+def get_rate_limiter() -> Optional[RateLimitBackend]:
+    """ Return the rate limiter of the process, None when rate limiting is disabled. """
+    global rate_limiter
+    if settings.RATE_LIMIT_BACKEND == "none":
+        return None
+    if rate_limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "mongo":
+            rate_limiter = MongoRateLimitBackend(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST)
+        else:
+            rate_limiter = MemoryRateLimitBackend(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST,
+                                                  settings.RATE_LIMIT_MAX_KEYS)
+    return rate_limiter
@@ -1,7 +1,12 @@
+import json
+import math
 import secrets
-from fastapi import Depends, HTTPException, status, Header
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status, Header
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from app.core import Hasher, settings
+from app.core.metrics import REQUESTS_REJECTED
+from app.core.rate_limit import get_rate_limiter
 from app.repositories import UserRepository
 from app.storages.database_storage import get_db
 
@@ -18,12 +23,14 @@ async def get_token_header(x_token: str = Header(...)):
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
 
 
-async def get_token_app_header(x_token: str = Header(...), identifier: str = Header(...), client: str = Header(...)):
+async def get_token_app_header(x_token: str = Header(...), identifier: str = Header(...), client: str = Header(...),
+                               db=Depends(get_db)):
     """
-    Get the token and application identifier data from the header
+    Get the token and application identifier data from the header, each client and identifier is rate limited
     :param x_token: str
     :param identifier: str
     :param client: str
+    :param db: Database
     :return: None
     """
     if x_token != settings.API_TOKEN:
@@ -32,6 +39,31 @@ async def get_token_app_header(x_token: str = Header(...), identifier: str = Hea
         raise HTTPException(status_code=401, detail="Missing Identifier")
     if client is None:
         raise HTTPException(status_code=401, detail="Missing Client")
+    await _take_token(client, identifier, db)
+
+
+async def limit_rate(request: Request, identifier: Optional[str] = Header(None), client: Optional[str] = Header(None),
+                     db=Depends(get_db)):
+    """
+    Rate limit each client and identifier, the address of the caller stands for a missing client header
+    :param request: Request
+    :param identifier: str
+    :param client: str
+    :param db: Database
+    :return: None
+    """
+    await _take_token(client or (request.client.host if request.client else None), identifier, db)
+
+
+async def _take_token(client: Optional[str], identifier: Optional[str], db):
+    """ Take a token of the client and identifier bucket, 429 with Retry-After when it is empty. """
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        wait = await limiter.take(json.dumps([client, identifier]), db)
+        if wait > 0:
+            REQUESTS_REJECTED.labels("rate_limit").inc()
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers={"Retry-After": str(math.ceil(wait))})
 
 
 async def validate_auth(credentials: HTTPBasicCredentials = Depends(_security), db=Depends(get_db)):
@@ -46,7 +78,7 @@ async def validate_auth(credentials: HTTPBasicCredentials = Depends(_security),
 
     if user:
         correct_username = secrets.compare_digest(credentials.username, user['username'])
-        correct_password = Hasher.verify_password(credentials.password, user['password'])
+        correct_password = await Hasher.verify_password_async(credentials.password, user['password'])
 
         if (correct_username and correct_password):
             return credentials.username
@@ -0,0 +1,36 @@
+"""
+Hooks of a gunicorn worker process, called from gunicorn_conf.py.
+With preload_app the master imports the application once and the workers are forked from it, so anything
+the master may have filled in before the fork is reset here and each worker opens its own MongoDb client.
+"""
+from app.core import rate_limit
+from app.core.hasher import verified_cache
+from app.middlewares.compression import compressed_caches
+from app.repositories.batch_loader import loaders
+from app.repositories.write_coalescer import coalescers
+from app.storages import database_storage
+from app.storages.document_cache import caches
+from app.storages.text_index import text_searches
+
+
+def init_worker():
+    """ Reset the state inherited from the master and create the MongoDb client of this worker. """
+    database_storage.discard_client()
+    for cache in caches.values():
+        cache.clear()
+    for text_search in text_searches.values():
+        text_search.clear()
+    for loader in loaders.values():
+        loader.clear()
+    for coalescer in coalescers.values():
+        coalescer.clear()
+    for compressed_cache in compressed_caches:
+        compressed_cache.clear()
+    verified_cache.clear()
+    rate_limit.rate_limiter = None
+    database_storage.create_client()
+
+
+def exit_worker():
+    """ Close the MongoDb client of this worker if the application shutdown did not. """
+    database_storage.close_client()
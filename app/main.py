@@ -1,10 +1,12 @@
 from fastapi import FastAPI, Depends
-from fastapi.middleware.gzip import GZipMiddleware
+from app.codecs import MongoJSONResponse
 from app.routes import base_route
-from app.routes.v1.admin import user_route
 from app.routes.v1.person_route import router
 from app.core.config import settings
-from app.core.security import get_token_header
+from app.core.security import get_token_header, limit_rate
+from app.middlewares import CompressionMiddleware, LoadSheddingMiddleware, MetricsMiddleware
+from app.openapi import load_schema
+from app.repositories.indexes import ensure_indexes_on_startup
 from app.storages.database_storage import close_db, connect_db
 
 
@@ -15,23 +17,36 @@ def get_application():
         version=settings.PROJECT_VERSION,
         description=settings.PROJECT_DESCRIPTION,
         debug=False,
+        default_response_class=MongoJSONResponse,
         swagger_ui_parameters={
             "defaultModelsExpandDepth": -1,
             "tagsSorter": "alpha",
         },
     )
     if (settings.ENABLE_ADMIN):
+        from app.routes.v1.admin import cache_route, user_route
         _app.include_router(user_route.router, dependencies=[Depends(get_token_header)])
+        _app.include_router(cache_route.router, dependencies=[Depends(get_token_header)])
     _app.include_router(base_route.router)
-    _app.include_router(router)
+    _app.include_router(router, dependencies=[Depends(limit_rate)])
+    if settings.ENABLE_METRICS:
+        _app.add_middleware(MetricsMiddleware)
+    _app.add_middleware(LoadSheddingMiddleware, max_in_flight=settings.LOAD_SHEDDING_MAX_IN_FLIGHT,
+                        max_pool_waiting=settings.LOAD_SHEDDING_MAX_POOL_WAITING,
+                        retry_after=settings.LOAD_SHEDDING_RETRY_AFTER)
+    if settings.OPENAPI_SCHEMA_FILE:
+        load_schema(_app, settings.OPENAPI_SCHEMA_FILE)
     return _app
 
 
 def get_complete_application():
     """In production need to start and close db connection and some middleware."""
     _app = get_application()
-    _app.add_middleware(GZipMiddleware, minimum_size=1000)
+    _app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+                        encodings=settings.COMPRESSION_ENCODINGS, levels=settings.COMPRESSION_LEVELS,
+                        cache_size=settings.COMPRESSION_CACHE_SIZE)
     _app.add_event_handler("startup", connect_db)
+    _app.add_event_handler("startup", ensure_indexes_on_startup)
     _app.add_event_handler("shutdown", close_db)
     return _app
 
@@ -0,0 +1,3 @@
+from .compression import CompressionMiddleware
+from .load_shedding import LoadSheddingMiddleware
+from .metrics import MetricsMiddleware
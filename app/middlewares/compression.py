@@ -0,0 +1,220 @@
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+_COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+_DEFAULT_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+
+
+class _GzipStream(object):
+    __slots__ = ['_compressor']
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream(object):
+    __slots__ = ['_compressor']
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream(object):
+    __slots__ = ['_compressor']
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+ENCODERS = {"gzip": (_gzip, _GzipStream)}
+if brotli is not None:
+    ENCODERS["br"] = (lambda body, level: brotli.compress(body, quality=level), _BrotliStream)
+if zstandard is not None:
+    ENCODERS["zstd"] = (lambda body, level: zstandard.ZstdCompressor(level=level).compress(body), _ZstdStream)
+
+
+def negotiate(accept_encoding: str, preference: List[str]) -> Optional[str]:
+    """ Pick the preferred available encoding the client accepts with the highest q value, None for identity. """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in preference:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in ENCODERS and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressedCache(object):
+    """ LRU of compressed bodies keyed by method, path, query, ETag and encoding, so unchanged hot responses are compressed once. """
+    __slots__ = ['max_size', '_entries', 'hits', 'misses', '__weakref__']
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Caches of every compression middleware of the process, cleared when a worker starts
+compressed_caches: weakref.WeakSet = weakref.WeakSet()
+
+
+class CompressionMiddleware(object):
+    """
+    Compress responses with brotli, zstd or gzip as negotiated through Accept-Encoding, at a level chosen per content type.
+    Complete bodies are compressed in one go and cached when they carry an ETag, streamed bodies are compressed and
+    flushed chunk by chunk so they keep streaming. Responses that already have a Content-Encoding are left alone.
+    The ETag of a compressed response becomes weak since its bytes depend on the encoding.
+    Every response of a compressible type varies on Accept-Encoding, even when it is sent as is.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, encodings: List[str] = None,
+                 levels: Dict[str, Dict[str, int]] = None, cache_size: int = 256):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = [encoding for encoding in (encodings or ["br", "zstd", "gzip"]) if encoding in ENCODERS]
+        self.levels = levels or {}
+        self.cache = CompressedCache(cache_size) if cache_size > 0 else None
+        if self.cache is not None:
+            compressed_caches.add(self.cache)
+
+    def level(self, content_type: str, encoding: str) -> int:
+        """ Level of an encoding for a content type, falling back to the * entry then to the defaults. """
+        for key in (content_type, "*"):
+            if encoding in self.levels.get(key, {}):
+                return self.levels[key][encoding]
+        return _DEFAULT_LEVELS[encoding]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        start: Message = {}
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                passthrough = "content-encoding" in headers or not content_type.startswith(_COMPRESSIBLE)
+                if not passthrough:
+                    headers.add_vary_header("Accept-Encoding")
+                passthrough = passthrough or encoding is None
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                if start:
+                    await send(start)
+                    start = {}
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                if not more_body:
+                    body = self._compress(scope, headers, content_type, encoding, body)
+                    headers["Content-Length"] = str(len(body))
+                else:
+                    stream = ENCODERS[encoding][1](self.level(content_type, encoding))
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                    body = stream.compress(body) if body else b""
+                headers["Content-Encoding"] = encoding
+                if (etag := headers.get("etag")) and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            chunk = stream.compress(body) if body else b""
+            if not more_body:
+                chunk += stream.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, scope: Scope, headers: MutableHeaders, content_type: str, encoding: str, body: bytes) -> bytes:
+        etag = headers.get("etag")
+        key = (scope["method"], scope["path"], scope.get("query_string", b""), etag, encoding)
+        if self.cache is not None and etag and (cached := self.cache.get(key)) is not None:
+            return cached
+        compressed = ENCODERS[encoding][0](body, self.level(content_type, encoding))
+        if self.cache is not None and etag:
+            self.cache.set(key, compressed)
+        return compressed
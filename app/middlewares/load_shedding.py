@@ -0,0 +1,48 @@
+from typing import Iterable
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.metrics import REQUESTS_REJECTED
+from app.storages.pool_monitor import pool_stats
+
+_BODY = b'{"detail":"Service overloaded, retry later"}'
+
+
+class LoadSheddingMiddleware(object):
+    """
+    Answer 503 with Retry-After at once when this worker already serves max_in_flight requests or when
+    max_pool_waiting operations wait for a MongoDb connection, instead of queueing until the worker timeout.
+    A limit of 0 disables it, exempt paths such as the health check and metrics are always served.
+    """
+
+    def __init__(self, app: ASGIApp, max_in_flight: int = 0, max_pool_waiting: int = 0, retry_after: int = 1,
+                 exempt_paths: Iterable[str] = ("/", "/metrics", "/status/pool")):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_pool_waiting = max_pool_waiting
+        self.exempt_paths = frozenset(exempt_paths)
+        self.in_flight = 0
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(_BODY)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+
+    def overloaded(self) -> bool:
+        """ Whether a new request would exceed one of the limits. """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return True
+        return bool(self.max_pool_waiting) and pool_stats.waiting >= self.max_pool_waiting
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        if self.overloaded():
+            REQUESTS_REJECTED.labels("overload").inc()
+            await send({"type": "http.response.start", "status": 503, "headers": self._headers})
+            await send({"type": "http.response.body", "body": _BODY})
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -1,2 +1,2 @@
 from .user_model import UserModel, UpdateUserModel, ShowUserModel, CreateUserModel
-from .person_model import PersonModel, PersonUpdateModel, PersonFilterModel
+from .person_model import PersonModel, PersonUpdateModel, PersonFilterModel, PersonSearchModel, PersonSortField
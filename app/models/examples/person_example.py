@@ -1,6 +1,6 @@
 example = {
     "name": "Jack of all trades",
-    "age": "42",
+    "age": 42,
     "occupation": "King of the world",
     "hobbies": [
         "Sleeping",
@@ -8,8 +8,8 @@ example = {
         "Being a jack of all trades"
     ],
     "friends": [
-        {"name": "Jill", "age": "42", "occupation": "King of another world"},
-        {"name": "Jane", "age": "50", "occupation": "Queen of another world"}
+        {"name": "Jill", "age": 42, "occupation": "King of another world"},
+        {"name": "Jane", "age": 50, "occupation": "Queen of another world"}
     ],
     "created_at": "2020-01-01T00:00:00.000Z",
     "last_update": "2020-01-01T00:00:00.000Z"
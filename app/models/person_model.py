@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from bson.objectid import ObjectId
@@ -32,7 +33,7 @@ class PersonModel(BaseModel):
 
 class PersonUpdateModel(BaseModel):
     name: Optional[str] = Field(description="The name of the person", min_length=1, max_length=255)
-    age: Optional[str] = Field(description="The age of the person", min_length=1, max_length=255)
+    age: Optional[int] = Field(description="The age of the person", gt=0)
     occupation: Optional[str] = Field(description="The occupation of the person", min_length=1, max_length=255)
     hobbies: Optional[List[str]] = Field(description="The hobbies of the person")
     friends: Optional[List[Friend]] = Field(description="The friends of the person")
@@ -45,13 +46,24 @@ class PersonUpdateModel(BaseModel):
         schema_extra = {"example": example_update}
 
 
+class PersonSearchModel(PersonUpdateModel):
+    score: float = Field(description="The relevance of the person for the searched text")
+
+
 class PersonFilterModel(BaseModel):
     name: Optional[str] = Field(description="The name of the person", min_length=1, max_length=255)
-    age: Optional[str] = Field(description="The age of the person", min_length=1, max_length=255)
+    name_prefix: Optional[str] = Field(description="The beginning of the name of the person", min_length=1, max_length=255, path="name", op="prefix")
+    age: Optional[int] = Field(description="The age of the person", ge=0)
+    age_min: Optional[int] = Field(description="The minimum age of the person", ge=0, path="age", op="$gte")
+    age_max: Optional[int] = Field(description="The maximum age of the person", ge=0, path="age", op="$lte")
     occupation: Optional[str] = Field(description="The occupation of the person", min_length=1, max_length=255)
-    hobby: Optional[str] = Field(description="The hobby of the person")
-    friend_name: Optional[str] = Field(description="The friends of the person")
+    occupation_in: Optional[str] = Field(description="Comma separated occupations, any of them matches", min_length=1, path="occupation", op="$in")
+    hobby: Optional[str] = Field(description="The hobby of the person", path="hobbies")
+    hobby_in: Optional[str] = Field(description="Comma separated hobbies, any of them matches", min_length=1, path="hobbies", op="$in")
+    friend_name: Optional[str] = Field(description="The friends of the person", path="friends.name")
     created_at: Optional[datetime] = Field(description="The creation date of the person")
+    created_after: Optional[datetime] = Field(description="Created at or after this date", path="created_at", op="$gte")
+    created_before: Optional[datetime] = Field(description="Created before this date", path="created_at", op="$lt")
     last_update: Optional[datetime] = Field(description="The last update of the person")
 
     class Config:
@@ -61,6 +73,14 @@ class PersonFilterModel(BaseModel):
         json_encoders = {ObjectId: str, datetime: str}
 
 
+class PersonSortField(str, Enum):
+    id = "_id"
+    name = "name"
+    age = "age"
+    created_at = "created_at"
+    last_update = "last_update"
+
+
 def filter_to_nested_model(update_model: PersonFilterModel) -> PersonUpdateModel:
     if update_model.hobby:
         hobbies = [update_model.hobby]
@@ -0,0 +1,44 @@
+"""
+Serialize the OpenAPI schema once at build time so the workers load it instead of generating it.
+
+    python -m app.openapi /app/openapi.json
+
+Run it with the settings the workers use, a schema whose paths no longer match the routes is ignored.
+"""
+import json
+import logging
+import sys
+from fastapi import FastAPI
+
+_logger = logging.getLogger(__name__)
+
+
+def _schema_paths(app: FastAPI) -> set:
+    return {route.path for route in app.routes if getattr(route, "include_in_schema", False)}
+
+
+def write_schema(app: FastAPI, path: str):
+    """ Generate the schema of the application and write it to a file. """
+    app.openapi_schema = None
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(app.openapi(), file, separators=(",", ":"))
+
+
+def load_schema(app: FastAPI, path: str) -> bool:
+    """ Serve a prebuilt schema, False when it is missing or was built for other routes. """
+    try:
+        with open(path, encoding="utf-8") as file:
+            schema = json.load(file)
+    except (OSError, ValueError) as error:
+        _logger.warning("OpenAPI schema %s not loaded: %s", path, error)
+        return False
+    if set(schema.get("paths", {})) != _schema_paths(app):
+        _logger.warning("OpenAPI schema %s does not match the routes, it will be generated", path)
+        return False
+    app.openapi_schema = schema
+    return True
+
+
+if __name__ == "__main__":
+    from app.main import get_application
+    write_schema(get_application(), sys.argv[1] if len(sys.argv) > 1 else "openapi.json")
@@ -1,2 +1,3 @@
 from .person_repository import PersonRepository
 from .user_repository import UserRepository
+from .rate_limit_repository import RateLimitRepository
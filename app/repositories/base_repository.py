@@ -1,79 +1,449 @@
-
+import asyncio
+from typing import AsyncIterator, List, Optional
+from pymongo import IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.storages.database_filter import decode_cursor, encode_cursor, format_keyset_to_filter
 from app.storages.database_storage import Database
+from app.storages.document_cache import CacheBackend
+from app.storages.text_index import MemoryTextSearch
+from app.repositories.batch_loader import BatchLoader
+from app.repositories.write_coalescer import WriteCoalescer
+
+
+_INDEX_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
 
 
 class BaseRepository(object):
-    __slots__ = ['collection']
+    __slots__ = ['collection', 'cache', 'loader', 'text_search', 'coalescer']
+    indexes: List[IndexModel] = []
 
-    def __init__(self, table_name):
+    def __init__(self, table_name, cache: CacheBackend = None, loader: BatchLoader = None,
+                 text_search: MemoryTextSearch = None, coalescer: WriteCoalescer = None):
         self.collection: str = table_name
+        self.cache: CacheBackend = cache
+        self.loader: BatchLoader = loader
+        self.text_search: MemoryTextSearch = text_search
+        self.coalescer: WriteCoalescer = coalescer
 
     async def create(self, element, db: Database):
-        """ Create a new element in the repository. """
-        insert_id = await self.insert(element, db)
-        return await self.get_by_id(insert_id, db)
+        """ Create a new element in the repository, return it as sent since the insert stores it unchanged. """
+        await self.insert(element, db)
+        self._remember(db, element)
+        return element
+
+    async def create_if_missing(self, element, db: Database):
+        """
+        Create an element unless its id already exists, return the stored one in a single upsert.
+        With a write coalescer the element is inserted in a batch and the stored one is only read on a duplicate id.
+        """
+        if self.coalescer is not None:
+            try:
+                await self.insert(element, db)
+            except DuplicateKeyError:
+                stored = await db[self.collection].find_one({'_id': element['_id']})
+                if stored is None:
+                    raise
+                self._remember(db, stored)
+                return stored
+            self._remember(db, element)
+            return element
+        fields = {k: v for k, v in element.items() if k != '_id'}
+        stored = await db[self.collection].find_one_and_update(
+            {'_id': element['_id']}, {'$setOnInsert': fields}, upsert=True, return_document=ReturnDocument.AFTER)
+        self._remember(db, stored)
+        return stored
 
     async def insert(self, element, db: Database) -> str:
-        """ Insert a new element in the repository. """
-        return (await db[self.collection].insert_one(element)).inserted_id
+        """ Insert a new element in the repository, batched with concurrent inserts when configured. """
+        if self.coalescer is not None:
+            insert_id = await self.coalescer.insert(element, db)
+        else:
+            insert_id = (await db[self.collection].insert_one(element)).inserted_id
+        if self.text_search is not None:
+            self.text_search.changed(db, insert_id)
+        return insert_id
 
     async def create_many(self, elements: list, db: Database) -> list:
         """ Create a new element in the repository. """
-        ids_list = await self.insert_many(elements, db)
-        return await db[self.collection].find({"_id": {"$in": ids_list}}).to_list(None)
+        await self.insert_many(elements, db)
+        return elements
 
-    async def insert_many(self, elements: list, db: Database) -> list:
+    async def insert_many(self, elements: list, db: Database, ordered: bool = True) -> list:
         """ Insert a new element in the repository. """
-        return (await db[self.collection].insert_many(elements)).inserted_ids
+        inserted_ids = (await db[self.collection].insert_many(elements, ordered=ordered)).inserted_ids
+        if self.text_search is not None:
+            self.text_search.changed(db, *inserted_ids)
+        return inserted_ids
 
-    async def get_by_id(self, id: str, db: Database):
-        """ Get an element by id. """
-        return await db[self.collection].find_one({'_id': id})
+    async def bulk_insert(self, elements: list, db: Database) -> list:
+        """
+        Insert elements with one unordered insert_many, every element that can be stored is.
+        :return: the (index, detail) of the elements that were rejected
+        """
+        if not elements:
+            return []
+        try:
+            await db[self.collection].insert_many(elements, ordered=False)
+            errors = []
+        except BulkWriteError as error:
+            errors = [(write_error['index'], write_error['errmsg']) for write_error in error.details['writeErrors']]
+        self._invalidate(db, *(element['_id'] for element in elements))
+        return errors
+
+    async def get_by_id(self, id: str, db: Database, projection: dict = None):
+        """
+        Get an element by id, read through the cache and batched with concurrent lookups when configured.
+        The whole element is read and cached then the projection is applied to it, unless it selects nested fields.
+        """
+        if (self.cache is None and self.loader is None) or (projection and any('.' in key for key in projection)):
+            return await db[self.collection].find_one({'_id': id}, projection)
+        return _project(await self._get_whole_by_id(id, db), projection)
+
+    async def _get_whole_by_id(self, id: str, db: Database):
+        if self.cache is None:
+            return await self.loader.load(id, db)
+        key = (db.name, id)
+        if (element := self.cache.get(key)) is not None:
+            return element
+        generation = self.cache.begin_read(key)
+        element = None
+        try:
+            if self.loader is not None:
+                element = await self.loader.load(id, db)
+            else:
+                element = await db[self.collection].find_one({'_id': id})
+        finally:
+            self.cache.end_read(key, generation, element)
+        return element
 
-    async def get_one(self, filter: dict, db: Database):
+    async def get_one(self, filter: dict, db: Database, projection: dict = None):
         """ Get an element by id. """
-        return await db[self.collection].find_one(filter)
+        return await db[self.collection].find_one(filter, projection)
 
-    async def get_by(self, filter: dict, db: Database) -> list:
+    async def get_by(self, filter: dict, db: Database, projection: dict = None) -> list:
         """ Get an element by id. """
-        return await db[self.collection].find(filter).to_list(None)
+        return await db[self.collection].find(filter, projection).to_list(None)
 
-    async def get_by_and_sort(self, filter: dict, sort_field, db: Database) -> list:
+    async def get_by_and_sort(self, filter: dict, sort_field, db: Database, projection: dict = None) -> list:
         """ Get an element by id. """
-        return await db[self.collection].find(filter).sort(sort_field).to_list(None)
+        return await db[self.collection].find(filter, projection).sort(sort_field).to_list(None)
 
-    async def get_all(self, db: Database) -> list:
+    async def get_all(self, db: Database, projection: dict = None) -> list:
         """ Get all elements in the repository. """
-        return await db[self.collection].find().to_list(None)
+        return await db[self.collection].find({}, projection).to_list(None)
 
-    async def get_all_by(self, filter: dict, db: Database) -> list:
+    async def get_all_by(self, filter: dict, db: Database, projection: dict = None) -> list:
         """ Get all elements in the repository. """
-        return await db[self.collection].find(filter).to_list(None)
+        return await db[self.collection].find(filter, projection).to_list(None)
+
+    async def iterate(self, filter: dict, db: Database, sort_field=None, batch_size: int = 500,
+                      projection: dict = None) -> AsyncIterator[dict]:
+        """ Iterate over the elements matching the filter, one cursor batch in memory at a time. """
+        cursor = db[self.collection].find(filter, projection).batch_size(batch_size)
+        if sort_field:
+            cursor = cursor.sort(sort_field)
+        async for element in cursor:
+            yield element
 
     async def update(self, id: str, element, db: Database):
         """ Update an element in the repository. """
-        return await db[self.collection].update_one({'_id': id}, {'$set': element})
+        result = await db[self.collection].update_one({'_id': id}, {'$set': element})
+        self._invalidate(db, id)
+        return result
+
+    async def update_and_get(self, id: str, element, db: Database, filter: dict = None, projection: dict = None):
+        """ Update an element matching the extra filter and return it as stored, None when nothing matched. """
+        result = await db[self.collection].find_one_and_update(
+            {'_id': id, **(filter or {})}, {'$set': element}, projection, return_document=ReturnDocument.AFTER)
+        if result is not None and projection is None:
+            self._remember(db, result)
+        else:
+            self._invalidate(db, id)
+        return result
 
     async def update_list(self, elements: list, db: Database) -> list:
-        """ Update a list of elements in the repository. """
-        results = []
-        for element in elements:
-            result = await self.update(element['_id'], element, db)
-            results.append(result)
-        return results
+        """ Update a list of elements in the repository, return the updated elements. """
+        return (await self.bulk_update(elements, db))['updated']
+
+    async def bulk_update(self, elements: list, db: Database, ordered: bool = True, chunk_size: int = 500) -> dict:
+        """
+        Update a list of elements with one bulk_write and one $in read back per chunk.
+        In ordered mode the first failure stops the remaining elements, unordered mode applies every element it can.
+        :return: dict with the updated elements in input order and the per item errors
+        """
+        updated = []
+        errors = []
+        for start in range(0, len(elements), chunk_size):
+            chunk = elements[start:start + chunk_size]
+            failed = await self._bulk_write_chunk(chunk, db, ordered)
+            stop = min(failed) if ordered and failed else len(chunk)
+            ids = [element['_id'] for index, element in enumerate(chunk[:stop]) if index not in failed]
+            found = {doc['_id']: doc for doc in await db[self.collection].find({'_id': {'$in': ids}}).to_list(None)}
+            self._invalidate(db, *(element['_id'] for element in chunk))
+            for index, element in enumerate(chunk):
+                if index in failed:
+                    detail = failed[index]
+                elif index >= stop:
+                    detail = "not attempted"
+                elif element['_id'] not in found:
+                    detail = "not found"
+                else:
+                    updated.append(found[element['_id']])
+                    continue
+                errors.append({'index': start + index, '_id': element['_id'], 'detail': detail})
+            if ordered and failed:
+                errors.extend({'index': index, '_id': element['_id'], 'detail': "not attempted"}
+                              for index, element in enumerate(elements[start + chunk_size:], start + chunk_size))
+                break
+        return {'updated': updated, 'errors': errors}
+
+    async def _bulk_write_chunk(self, chunk: list, db: Database, ordered: bool) -> dict:
+        """ Send one chunk of updates, return the write errors by index inside the chunk. """
+        requests = []
+        positions = []
+        for index, element in enumerate(chunk):
+            fields = {k: v for k, v in element.items() if k != '_id'}
+            if fields:
+                requests.append(UpdateOne({'_id': element['_id']}, {'$set': fields}))
+                positions.append(index)
+        if not requests:
+            return {}
+        try:
+            await db[self.collection].bulk_write(requests, ordered=ordered)
+        except BulkWriteError as error:
+            return {positions[write_error['index']]: write_error['errmsg'] for write_error in error.details['writeErrors']}
+        return {}
 
     async def delete(self, id: str, db: Database):
         """ Delete an element by id. """
-        return await db[self.collection].delete_one({'_id': id})
+        result = await db[self.collection].delete_one({'_id': id})
+        self._invalidate(db, id)
+        return result
 
     async def delete_many(self, filter: dict, db: Database):
         """ Delete an element by id. """
-        return await db[self.collection].delete_many(filter)
+        result = await db[self.collection].delete_many(filter)
+        if self.cache is not None:
+            self.cache.clear()
+        if self.loader is not None:
+            self.loader.forget(db)
+        if self.text_search is not None:
+            self.text_search.changed(db)
+        return result
+
+    def _invalidate(self, db: Database, *ids):
+        """ Drop cached copies, shared lookups and text index entries of the given elements. """
+        if self.cache is not None:
+            for id in ids:
+                self.cache.delete((db.name, id))
+        if self.loader is not None and ids:
+            self.loader.forget(db, *ids)
+        if self.text_search is not None and ids:
+            self.text_search.changed(db, *ids)
+
+    def _remember(self, db: Database, element: dict):
+        """ Write an element known to be stored through the cache. """
+        self._invalidate(db, element['_id'])
+        if self.cache is not None:
+            self.cache.set((db.name, element['_id']), element)
 
-    async def get_by_and_sort_with_pagination(self, filter: dict, sort_field, page: int, per_page: int, db):
+    async def search(self, text: str, page: int, per_page: int, db: Database, projection: dict = None) -> list:
+        """
+        Get the elements matching any word of the text, best score first, each with its relevance in `score`.
+        Uses the collection text index, or the in process index when configured or when $text is unsupported.
+        """
+        skip = per_page * (page - 1)
+        if self.text_search is not None and not self.text_search.fallback:
+            return await self._search_memory(text, skip, per_page, db, projection)
+        try:
+            return await self._search_text(text, skip, per_page, db, projection)
+        except NotImplementedError:
+            if self.text_search is None:
+                raise
+            return await self._search_memory(text, skip, per_page, db, projection)
+
+    async def _search_text(self, text: str, skip: int, limit: int, db: Database, projection: dict) -> list:
+        projection = dict(projection or {}, score={'$meta': 'textScore'})
+        return await db[self.collection].find({'$text': {'$search': text}}, projection).sort(
+            [('score', {'$meta': 'textScore'}), ('_id', 1)]).skip(skip).limit(limit).to_list(None)
+
+    async def _search_memory(self, text: str, skip: int, limit: int, db: Database, projection: dict) -> list:
+        scores = dict((await self.text_search.search(db, text, skip + limit))[skip:])
+        if not scores:
+            return []
+        elements = await db[self.collection].find({'_id': {'$in': list(scores)}}, projection).to_list(None)
+        if missing := scores.keys() - {element['_id'] for element in elements}:
+            self.text_search.changed(db, *missing)
+        order = {id: position for position, id in enumerate(scores)}
+        for element in elements:
+            element['score'] = scores[element['_id']]
+        return sorted(elements, key=lambda element: order[element['_id']])
+
+    async def get_by_and_sort_with_pagination(self, filter: dict, sort_field, page: int, per_page: int, db,
+                                              projection: dict = None):
         """ Get an element by id. """
-        return await db[self.collection].find(filter).sort(sort_field).skip(page * per_page).limit(per_page).to_list(None)
+        return await db[self.collection].find(filter, projection).sort(sort_field).skip(page * per_page).limit(per_page).to_list(None)
+
+    async def get_by_and_sort_with_keyset(self, filter: dict, sort_field: str, per_page: int, db: Database,
+                                          cursor: str = None, direction: int = 1, projection: dict = None) -> tuple:
+        """ Get a page sorted by (sort_field, _id) seeking past the cursor, return the page and the next cursor. """
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor, sort_field, direction)
+            filter = format_keyset_to_filter(filter, sort_field, direction, sort_value, last_id)
+        sort = _keyset_sort(sort_field, direction)
+        elements = await db[self.collection].find(filter, _include_fields(projection, sort_field)) \
+            .sort(sort).limit(per_page + 1).to_list(None)
+        return _keyset_page(elements, sort_field, direction, per_page, projection)
+
+    async def get_by_and_sort_with_keyset_and_count(self, filter: dict, sort_field: str, per_page: int, db: Database,
+                                                    cursor: str = None, direction: int = 1,
+                                                    projection: dict = None) -> tuple:
+        """
+        Same page as get_by_and_sort_with_keyset plus the total matching the filter.
+        Filtered totals come from the same $facet aggregation as the page, unfiltered ones from the collection metadata.
+        :return: page, next cursor and total
+        """
+        if not filter:
+            (elements, next_cursor), total = await asyncio.gather(
+                self.get_by_and_sort_with_keyset(filter, sort_field, per_page, db, cursor, direction, projection),
+                db[self.collection].estimated_document_count())
+            return elements, next_cursor, total
+        items = []
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor, sort_field, direction)
+            items.append({'$match': format_keyset_to_filter({}, sort_field, direction, sort_value, last_id)})
+        items.append({'$limit': per_page + 1})
+        if fetched := _include_fields(projection, sort_field):
+            items.append({'$project': fetched})
+        pipeline = [
+            {'$match': filter},
+            {'$sort': dict(_keyset_sort(sort_field, direction))},
+            {'$facet': {'items': items, 'total': [{'$count': 'count'}]}},
+        ]
+        result = (await db[self.collection].aggregate(pipeline).to_list(None))[0]
+        elements, next_cursor = _keyset_page(result['items'], sort_field, direction, per_page, projection)
+        return elements, next_cursor, result['total'][0]['count'] if result['total'] else 0
+
+    async def ensure_indexes(self, db: Database, rebuild: bool = True) -> dict:
+        """
+        Create the declared indexes that are missing and rebuild the ones whose definition changed.
+        Without rebuild changed indexes are only reported as outdated, they are not dropped.
+        """
+        existing = await db[self.collection].index_information()
+        missing = []
+        result = {'created': [], 'rebuilt': [], 'outdated': [], 'unchanged': []}
+        for index in self.indexes:
+            spec = index.document
+            current = existing.get(spec['name'])
+            if current is None:
+                result['created'].append(spec['name'])
+            elif _same_index(current, spec):
+                result['unchanged'].append(spec['name'])
+                continue
+            elif not rebuild:
+                result['outdated'].append(spec['name'])
+                continue
+            else:
+                await db[self.collection].drop_index(spec['name'])
+                result['rebuilt'].append(spec['name'])
+            missing.append(index)
+        if missing:
+            await db[self.collection].create_indexes(missing)
+        return result
 
     async def exists(self, filter: dict, db: Database) -> bool:
         """ Check if an element exists. """
         return await db[self.collection].count_documents(filter) > 0
+
+
+def _keyset_sort(sort_field: str, direction: int) -> list:
+    """ Sort by the key then by _id so the order is total. """
+    return [('_id', direction)] if sort_field == '_id' else [(sort_field, direction), ('_id', direction)]
+
+
+def _keyset_page(elements: list, sort_field: str, direction: int, per_page: int, projection: dict = None) -> tuple:
+    """
+    Cut a page fetched with one extra element, return it with the cursor of the next page.
+    The sort field read for the cursor is dropped again when the projection did not ask for it.
+    """
+    next_cursor = None
+    if len(elements) > per_page:
+        elements = elements[:per_page]
+        last = elements[-1]
+        next_cursor = encode_cursor(sort_field, direction, _get_path(last, sort_field), last['_id'])
+    if _is_inclusion(projection):
+        dropped = sort_field.split('.')[0]
+        if dropped in {key.split('.')[0] for key, value in projection.items() if value}:
+            dropped = None
+    else:
+        dropped = sort_field if projection and sort_field in projection else None
+    if dropped is not None:
+        for element in elements:
+            _drop_path(element, dropped)
+    return elements, next_cursor
+
+
+def _get_path(element: dict, path: str):
+    """ Read a dotted path from a document, None when missing. """
+    for key in path.split('.'):
+        if not isinstance(element, dict):
+            return None
+        element = element.get(key)
+    return element
+
+
+def _drop_path(element: dict, path: str):
+    """ Remove a dotted path from a document when present. """
+    *parents, key = path.split('.')
+    for parent in parents:
+        element = element.get(parent) if isinstance(element, dict) else None
+    if isinstance(element, dict):
+        element.pop(key, None)
+
+
+def _same_index(current: dict, spec: dict) -> bool:
+    """ Compare an index_information entry with a declared index document. """
+    if 'weights' in current:
+        if not _same_text_index(current, spec):
+            return False
+    elif [tuple(key) for key in current['key']] != [tuple(key) for key in spec['key'].items()]:
+        return False
+    return all(bool(current.get(option)) == bool(spec.get(option)) if option in ('unique', 'sparse')
+               else current.get(option) == spec.get(option) for option in _INDEX_OPTIONS)
+
+
+def _same_text_index(current: dict, spec: dict) -> bool:
+    """ MongoDb reports text indexes as _fts keys plus the weights of each field, 1 when not declared. """
+    fields = [field for field, kind in spec['key'].items() if kind == 'text']
+    weights = {field: spec.get('weights', {}).get(field, 1) for field in fields}
+    return bool(fields) and current['weights'] == weights and \
+        current.get('default_language', 'english') == spec.get('default_language', 'english')
+
+
+def _is_inclusion(projection: dict) -> bool:
+    """ Tell whether a projection lists the fields to keep rather than the ones to drop. """
+    return bool(projection) and any(value for key, value in projection.items() if key != '_id')
+
+
+def _project(element: Optional[dict], projection: dict = None) -> Optional[dict]:
+    """ Apply a projection of top level fields to a whole element, into a new one. """
+    if element is None or not projection:
+        return element
+    if _is_inclusion(projection):
+        return {key: value for key, value in element.items()
+                if projection.get(key) or (key == '_id' and projection.get('_id', 1))}
+    return {key: value for key, value in element.items() if projection.get(key, 1)}
+
+
+def _include_fields(projection: dict, *fields: str):
+    """ Make sure a projection keeps the given fields. """
+    if not projection:
+        return projection
+    projection = dict(projection)
+    if _is_inclusion(projection):
+        projection.update({field: 1 for field in fields})
+    else:
+        for field in fields:
+            projection.pop(field, None)
+    projection.pop('_id', None)
+    return projection or None
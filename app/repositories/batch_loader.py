@@ -0,0 +1,97 @@
+import asyncio
+from typing import Dict, Optional
+from app.core.config import settings
+from app.storages.database_storage import Database
+
+
+class BatchLoader(object):
+    """
+    Collect the by id lookups made during one event loop tick into a single $in query.
+    Lookups of an id that is already pending or in flight share its future, writes forget
+    the shared futures of the ids they touch so a later lookup never sees the old document.
+    """
+    __slots__ = ['collection', 'max_batch_size', '_futures', '_pending', '_tasks']
+
+    def __init__(self, collection: str, max_batch_size: int = 1000):
+        self.collection: str = collection
+        self.max_batch_size: int = max_batch_size
+        self._futures: Dict[tuple, asyncio.Future] = {}
+        self._pending: Dict[str, tuple] = {}
+        self._tasks: set = set()
+
+    async def load(self, id, db: Database) -> Optional[dict]:
+        """ Get an element by id, batched with the other lookups of this tick. """
+        loop = asyncio.get_running_loop()
+        key = (db.name, id)
+        future = self._futures.get(key)
+        if future is None or future.get_loop() is not loop:
+            future = self._enqueue(key, db, loop)
+        element = await asyncio.shield(future)
+        return dict(element) if element is not None else None
+
+    def forget(self, db: Database, *ids):
+        """ Stop sharing the pending or in flight lookups of the given ids, all of them when no id is given. """
+        if not ids:
+            self._futures = {key: future for key, future in self._futures.items() if key[0] != db.name}
+            return
+        for id in ids:
+            self._futures.pop((db.name, id), None)
+
+    def clear(self):
+        """ Forget every pending and in flight lookup, they belong to the event loop of another process. """
+        self._futures.clear()
+        self._pending.clear()
+        self._tasks.clear()
+
+    def _enqueue(self, key: tuple, db: Database, loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        batch = self._pending.get(db.name)
+        if batch is None or batch[2] is not loop:
+            batch = (db, {}, loop)
+            self._pending[db.name] = batch
+            loop.call_soon(self._dispatch, db.name, batch)
+        future = batch[1].get(key[1])
+        if future is None:
+            future = loop.create_future()
+            batch[1][key[1]] = future
+        self._futures[key] = future
+        if len(batch[1]) >= self.max_batch_size:
+            self._dispatch(db.name, batch)
+        return future
+
+    def _dispatch(self, name: str, batch: tuple):
+        if self._pending.get(name) is batch:
+            del self._pending[name]
+            task = asyncio.ensure_future(self._fetch(name, batch[0], batch[1]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, name: str, db: Database, futures: dict):
+        try:
+            elements = await db[self.collection].find({'_id': {'$in': list(futures)}}).to_list(None)
+        except Exception as error:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            found = {element['_id']: element for element in elements}
+            for id, future in futures.items():
+                if not future.done():
+                    future.set_result(found.get(id))
+        finally:
+            for id, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                if self._futures.get((name, id)) is future:
+                    del self._futures[(name, id)]
+
+
+loaders: Dict[str, BatchLoader] = {}
+
+
+def get_loader(name: str) -> Optional[BatchLoader]:
+    """ Return the shared batch loader of a collection, None when batching is disabled. """
+    if not settings.BATCH_BY_ID_LOOKUPS:
+        return None
+    if name not in loaders:
+        loaders[name] = BatchLoader(name, settings.BATCH_MAX_SIZE)
+    return loaders[name]
@@ -0,0 +1,60 @@
+"""
+Create or reconcile the indexes declared by every repository.
+
+    python -m app.repositories.indexes
+
+Workers only create the missing indexes at startup, changed definitions are rebuilt by this command,
+run once per deployment so the workers do not drop the same indexes concurrently.
+"""
+import asyncio
+import json
+import logging
+from pymongo.errors import PyMongoError
+from app.core.config import settings
+from app.repositories.person_repository import PersonRepository
+from app.repositories.rate_limit_repository import RateLimitRepository
+from app.repositories.user_repository import UserRepository
+from app.storages.database_storage import Database, close_db, get_db
+
+REPOSITORIES = (PersonRepository, UserRepository, RateLimitRepository)
+
+_logger = logging.getLogger(__name__)
+
+
+async def ensure_all_indexes(db: Database, rebuild: bool = True) -> dict:
+    """ Reconcile the declared indexes of every repository, return what changed by collection. """
+    results = {}
+    for repository in REPOSITORIES:
+        repo = repository()
+        results[repo.collection] = await repo.ensure_indexes(db, rebuild)
+    return results
+
+
+async def ensure_indexes_on_startup():
+    """
+    Create the missing indexes when ENSURE_INDEXES is set, failures are logged so the worker still starts.
+    Changed definitions are left to the command line, every worker runs this at the same time.
+    """
+    if not settings.ENSURE_INDEXES:
+        return
+    try:
+        results = await ensure_all_indexes(await get_db(), rebuild=False)
+    except PyMongoError as error:
+        _logger.error("Could not ensure indexes: %s", error)
+        return
+    _logger.info("Indexes: %s", results)
+    for collection, result in results.items():
+        if result['outdated']:
+            _logger.warning("Outdated indexes on %s: %s, rebuild them with python -m app.repositories.indexes",
+                            collection, ", ".join(result['outdated']))
+
+
+async def _main():
+    try:
+        print(json.dumps(await ensure_all_indexes(await get_db()), indent=2))
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,6 +1,26 @@
+from pymongo import ASCENDING, TEXT, IndexModel
 from app.repositories.base_repository import BaseRepository
+from app.repositories.batch_loader import get_loader
+from app.repositories.write_coalescer import get_coalescer
+from app.storages.document_cache import get_cache
+from app.storages.text_index import get_text_search
+
+_TEXT_WEIGHTS = {'name': 10, 'occupation': 5, 'hobbies': 1}
 
 
 class PersonRepository(BaseRepository):
+    indexes = [
+        IndexModel([('name', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('age', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('occupation', ASCENDING)]),
+        IndexModel([('hobbies', ASCENDING)]),
+        IndexModel([('friends.name', ASCENDING)], partialFilterExpression={'friends.name': {'$exists': True}}),
+        IndexModel([('created_at', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('last_update', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([(field, TEXT) for field in _TEXT_WEIGHTS], name='person_text', weights=_TEXT_WEIGHTS,
+                   default_language='none'),
+    ]
+
     def __init__(self):
-        super().__init__('_person_collection')
+        super().__init__('_person_collection', get_cache('_person_collection'), get_loader('_person_collection'),
+                         get_text_search('_person_collection', _TEXT_WEIGHTS), get_coalescer('_person_collection'))
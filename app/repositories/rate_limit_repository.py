@@ -0,0 +1,31 @@
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from app.repositories.base_repository import BaseRepository
+from app.storages.database_storage import Database
+
+_IDLE_SECONDS = 3600
+
+
+class RateLimitRepository(BaseRepository):
+    """ Token buckets shared by every worker, idle buckets expire since they would be full again anyway. """
+    indexes = [
+        IndexModel([('updated', ASCENDING)], expireAfterSeconds=_IDLE_SECONDS),
+    ]
+
+    def __init__(self):
+        super().__init__('rate_limit')
+
+    async def take(self, key: str, rate: float, burst: int, db: Database) -> float:
+        """
+        Refill the bucket of a key for the time elapsed and take one token from it in a single atomic upsert.
+        :return: 0 when a token was taken, otherwise the seconds until the next one
+        """
+        now = datetime.utcnow()
+        elapsed = {'$max': [0, {'$divide': [{'$subtract': [now, {'$ifNull': ['$updated', now]}]}, 1000]}]}
+        refilled = {'$min': [burst, {'$add': [{'$ifNull': ['$tokens', burst]}, {'$multiply': [elapsed, rate]}]}]}
+        bucket = await db[self.collection].find_one_and_update({'_id': key}, [
+            {'$set': {'tokens': refilled, 'updated': {'$max': [now, {'$ifNull': ['$updated', now]}]}}},
+            {'$set': {'allowed': {'$gte': ['$tokens', 1]}}},
+            {'$set': {'tokens': {'$cond': ['$allowed', {'$subtract': ['$tokens', 1]}, '$tokens']}}},
+        ], upsert=True, return_document=ReturnDocument.AFTER)
+        return 0.0 if bucket['allowed'] else (1 - bucket['tokens']) / rate
@@ -1,6 +1,15 @@
+from pymongo import ASCENDING, IndexModel
 from app.repositories.base_repository import BaseRepository
+from app.repositories.batch_loader import get_loader
+from app.repositories.write_coalescer import get_coalescer
+from app.storages.document_cache import get_cache
 
 
 class UserRepository(BaseRepository):
+    indexes = [
+        IndexModel([('username', ASCENDING)], unique=True),
+        IndexModel([('email', ASCENDING)], unique=True),
+    ]
+
     def __init__(self):
-        super().__init__('user')
+        super().__init__('user', get_cache('user'), get_loader('user'), coalescer=get_coalescer('user'))
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Dict, Optional
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from app.core.config import settings
+from app.storages.database_storage import Database
+
+_DUPLICATE_KEY = 11000
+
+
+class WriteCoalescer(object):
+    """
+    Gather the single inserts made within max_delay seconds, or until max_batch_size of them, into one
+    unordered insert_many. Every caller gets the id of its own element or the error insert_one would have
+    raised for it, so a rejected element does not fail the others. A caller cancelled while waiting does not
+    take its element back, it is written with the rest of the batch.
+    """
+    __slots__ = ['collection', 'max_delay', 'max_batch_size', '_pending', '_tasks']
+
+    def __init__(self, collection: str, max_delay: float = 0.002, max_batch_size: int = 100):
+        self.collection: str = collection
+        self.max_delay: float = max_delay
+        self.max_batch_size: int = max_batch_size
+        self._pending: Dict[str, tuple] = {}
+        self._tasks: set = set()
+
+    async def insert(self, element: dict, db: Database):
+        """ Insert an element with the other inserts of the batch, return its id. """
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(db.name)
+        if batch is None or batch[3] is not loop:
+            batch = (db, [], [], loop)
+            self._pending[db.name] = batch
+            loop.call_later(self.max_delay, self._dispatch, db.name, batch)
+        future = loop.create_future()
+        batch[1].append(element)
+        batch[2].append(future)
+        if len(batch[1]) >= self.max_batch_size:
+            self._dispatch(db.name, batch)
+        return await future
+
+    def clear(self):
+        """ Forget every pending and in flight batch, they belong to the event loop of another process. """
+        self._pending.clear()
+        self._tasks.clear()
+
+    def _dispatch(self, name: str, batch: tuple):
+        if self._pending.get(name) is batch:
+            del self._pending[name]
+            task = asyncio.ensure_future(self._write(batch[0], batch[1], batch[2]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, db: Database, elements: list, futures: list):
+        errors = {}
+        try:
+            await db[self.collection].insert_many(elements, ordered=False)
+        except BulkWriteError as error:
+            for write_error in error.details['writeErrors']:
+                error_class = DuplicateKeyError if write_error.get('code') == _DUPLICATE_KEY else WriteError
+                errors[write_error['index']] = error_class(write_error['errmsg'], write_error.get('code'), write_error)
+        except Exception as error:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for index, (element, future) in enumerate(zip(elements, futures)):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(element['_id'])
+
+
+coalescers: Dict[str, WriteCoalescer] = {}
+
+
+def get_coalescer(name: str) -> Optional[WriteCoalescer]:
+    """ Return the shared write coalescer of a collection, None when coalescing is disabled. """
+    if not settings.WRITE_COALESCING:
+        return None
+    if name not in coalescers:
+        coalescers[name] = WriteCoalescer(name, settings.WRITE_COALESCING_MAX_DELAY_MS / 1000,
+                                          settings.WRITE_COALESCING_MAX_BATCH_SIZE)
+    return coalescers[name]
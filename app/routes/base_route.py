@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
+from app.core.metrics import CONTENT_TYPE, render_metrics
+from app.storages.pool_monitor import pool_stats
 
 
 router = APIRouter(
@@ -10,3 +12,13 @@ router = APIRouter(
 @router.get("/", status_code=200)
 def catch_all(__: Request):
     return {"message": "running..."}
+
+
+@router.get("/status/pool", status_code=200)
+def pool_status(__: Request):
+    return pool_stats.stats()
+
+
+@router.get("/metrics", status_code=200, include_in_schema=False)
+def metrics(__: Request):
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
@@ -1,59 +1,275 @@
-from fastapi import HTTPException
+import asyncio
+from typing import AsyncIterator, Optional, Type
+from fastapi import HTTPException, Request, Response
+from datetime import datetime, timezone
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from app.codecs import MongoJSONResponse, loads_document
 from app.repositories.base_repository import BaseRepository
+from app.routes.conditional import ANY_ETAG, ETAG_HEADER, decode_etag, etag_matches, make_etag, make_list_etag, \
+    parse_etags, version_now
+from app.routes.streaming import ExportCompression, ExportFormat, StreamFormat, export_response, ndjson_lines, \
+    stream_response
 from app.storages.database_storage import Database
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def _bson_datetime(value: datetime) -> datetime:
+    """ Naive UTC datetime at millisecond precision, the value MongoDb gives back for a stored date """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+_KEEP_DATETIME = {datetime: _bson_datetime}
+
+
+def to_document(element):
+    """
+    Encode a model to a database document, datetimes stay BSON dates so range queries can use indexes
+    and are already rounded as stored so the document can be returned without reading it back.
+    Models are turned into dicts first, jsonable_encoder would otherwise update their json_encoders in place
+    """
+    if isinstance(element, list):
+        return [to_document(item) for item in element]
+    if isinstance(element, BaseModel):
+        encoders = {**element.__config__.json_encoders, **_KEEP_DATETIME}
+        return jsonable_encoder(element.dict(by_alias=True), custom_encoder=encoders)
+    return jsonable_encoder(element, custom_encoder=_KEEP_DATETIME)
+
+
+def select_fields(content, fields):
+    """ Keep only the given fields in an element or in every element of a list, in place """
+    keep = set(fields)
+    for element in content if isinstance(content, list) else [content]:
+        if element is not None:
+            for name in [name for name in element if name not in keep]:
+                del element[name]
+    return content
+
 
 class BasicRouter(object):
-    def __init__(self, repo, element_name: str = "element"):
+    def __init__(self, repo, element_name: str = "element", validate_responses: bool = True,
+                 version_field: str = None):
         self.repo: BaseRepository = repo
         self.element_name: str = element_name
+        self.validate_responses: bool = validate_responses
+        self.version_field: str = version_field
+
+    def respond(self, content, response: Response = None, fields=None):
+        """
+        Return database documents without response model validation when the router opted out of it,
+        then only the given response model fields are kept so both modes answer with the same shape
+        """
+        if self.validate_responses:
+            return content
+        if fields is not None:
+            content = select_fields(content, fields)
+        raw = MongoJSONResponse(content)
+        if response is not None:
+            for header in (NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, ETAG_HEADER):
+                if header in response.headers:
+                    raw.headers[header] = response.headers[header]
+        return raw
+
+    def versioned(self, projection: dict = None):
+        """ Make sure a projection keeps the version field the ETags are derived from """
+        if not projection or self.version_field is None or not any(projection.values()):
+            return projection
+        return {**projection, self.version_field: 1}
+
+    def tag(self, content, response: Response, projection: dict = None) -> Optional[str]:
+        """
+        Set the ETag of an element or a list in the response, None when some element has no version.
+        The ETag of a list also covers its next cursor and total headers, they change when elements are added
+        """
+        if self.version_field is None or content is None:
+            return None
+        elements = content if isinstance(content, list) else [content]
+        if any(element.get(self.version_field) is None for element in elements):
+            return None
+        if isinstance(content, list):
+            extra = [response.headers.get(NEXT_CURSOR_HEADER), response.headers.get(TOTAL_COUNT_HEADER)]
+            etag = make_list_etag(content, self.version_field, projection, extra)
+        else:
+            etag = make_etag(content[self.version_field], projection)
+        response.headers[ETAG_HEADER] = etag
+        return etag
+
+    def conditional(self, content, request: Request, response: Response, projection: dict = None, fields=None):
+        """
+        Respond with the content, or with 304 before any validation when If-None-Match names its ETag.
+        Fields read only for the ETag or the cursor, such as the version or the sort field, are dropped when the
+        projection did not ask for them
+        """
+        etag = self.tag(content, response, projection)
+        if etag is not None and etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={ETAG_HEADER: etag})
+        if projection and any(included for name, included in projection.items() if name != '_id'):
+            content = select_fields(content, [name for name, included in projection.items() if included])
+        return self.respond(content, response, fields)
+
+    def _version_filter(self, if_match: Optional[str]) -> Optional[dict]:
+        """ Filter keeping only the versions named by If-Match, 412 when none of them is one of ours """
+        if not if_match or self.version_field is None:
+            return None
+        tags = parse_etags(if_match)
+        if ANY_ETAG in tags:
+            return {}
+        versions = []
+        for tag in tags:
+            try:
+                versions.append(decode_etag(tag))
+            except ValueError:
+                continue
+        if not versions:
+            raise HTTPException(status_code=412, detail="Precondition failed")
+        return {self.version_field: versions[0] if len(versions) == 1 else {'$in': versions}}
+
+    async def _update(self, element_id: str, element: dict, db: Database, if_match: str = None,
+                      projection: dict = None):
+        """ Update and return an element in one round trip, stamping its version """
+        filter = self._version_filter(if_match)
+        if self.version_field is not None:
+            element[self.version_field] = version_now()
+        if (updated := await self.repo.update_and_get(element_id, element, db, filter, projection)) is not None:
+            return updated
+        if filter and await self.repo.exists({'_id': element_id}, db):
+            raise HTTPException(status_code=412, detail="Precondition failed")
+        raise HTTPException(status_code=404, detail=f"{self.element_name} {element_id} not found")
 
     async def create(self, element: BaseModel, db: Database):
         """ Create a new element """
-        element = jsonable_encoder(element)
+        element = to_document(element)
         return await self.repo.create(element, db)
 
     async def post(self, element, db: Database):
-        """ Create a new element return a json response with the created element """
-        element = jsonable_encoder(element)
-        if (existing := await self.repo.get_by_id(element["_id"], db)) is not None:
-            return existing
-        return await self.repo.create(element, db)
+        """ Create a new element return a json response with the created element, or the existing one with its id """
+        element = to_document(element)
+        return await self.repo.create_if_missing(element, db)
 
     async def create_list(self, elements: list, db: Database):
         """ Create a new elements return a list of created elements """
-        elements = jsonable_encoder(elements)
+        elements = to_document(elements)
         return await self.repo.create_many(elements, db)
 
     async def post_list(self, elements: list, db: Database):
         """ Create a new elements return a list of json response with the created elements """
-        elements = jsonable_encoder(elements)
+        elements = to_document(elements)
         return await self.repo.create_many(elements, db)
 
-    async def put(self, id, element, db):
+    async def import_ndjson(self, chunks: AsyncIterator[bytes], model: Type[BaseModel], db: Database,
+                            chunk_size: int = 1000, max_errors: int = 1000, max_line_size: int = 1048576) -> dict:
+        """
+        Validate and insert a newline delimited json body chunk by chunk with unordered inserts.
+        The next chunk is parsed while the previous one is written, the body is not read further until
+        that write is done, so memory stays bounded by two chunks whatever the size of the body.
+        A line longer than max_line_size bytes fails without being buffered, the import goes on from the next line
+        :return: the inserted and failed counts and the first errors by line number
+        """
+        result = {'inserted': 0, 'failed': 0, 'errors': []}
+
+        def fail(line: int, detail):
+            result['failed'] += 1
+            if len(result['errors']) < max_errors:
+                result['errors'].append({'line': line, 'detail': detail})
+
+        async def write(elements: list, lines: list):
+            errors = await self.repo.bulk_insert(elements, db)
+            result['inserted'] += len(elements) - len(errors)
+            for index, detail in errors:
+                fail(lines[index], detail)
+
+        elements, lines = [], []
+        pending = None
+        try:
+            async for number, line in ndjson_lines(chunks, max_line_size):
+                if line is None:
+                    fail(number, f"Line longer than {max_line_size} bytes")
+                    continue
+                try:
+                    elements.append(to_document(model.parse_obj(loads_document(line))))
+                    lines.append(number)
+                except ValidationError as error:
+                    fail(number, error.errors())
+                except ValueError as error:
+                    fail(number, str(error))
+                if len(elements) >= chunk_size:
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.ensure_future(write(elements, lines))
+                    elements, lines = [], []
+            if pending is not None:
+                await pending
+                pending = None
+            await write(elements, lines)
+        finally:
+            if pending is not None:
+                pending.cancel()
+        result['errors'].sort(key=lambda error: error['line'])
+        return result
+
+    async def put(self, id, element, db, projection: dict = None, if_match: str = None):
+        """ Update an element, when If-Match is given only while its version is one of the named ones """
         element = {k: v for k, v in element.dict().items() if v is not None}
-        if len(element) >= 1:
-            update_result = await self.repo.update(id, element, db)
-            if update_result.modified_count == 1:
-                if (updated := await self.repo.get_by_id(id, db)) is not None:
-                    return updated
-        if (existing := await self.repo.get_by_id(id, db)) is not None:
+        if len(element) >= 1 or self.version_field is not None:
+            return await self._update(id, element, db, if_match, projection)
+        if (existing := await self.repo.get_by_id(id, db, projection)) is not None:
             return existing
         raise HTTPException(status_code=404, detail=f"{self.element_name} {id} not found")
 
-    async def get_all(self, db: Database):
+    async def get_all(self, db: Database, projection: dict = None):
         """ Get all elements """
-        return await self.repo.get_all(db)
+        return await self.repo.get_all(db, projection)
 
-    async def get_all_by(self, filter: dict, db: Database):
+    async def get_all_by(self, filter: dict, db: Database, projection: dict = None):
         """ Get all elements by filter """
-        return await self.repo.get_all_by(filter, db)
+        return await self.repo.get_all_by(filter, db, projection)
 
-    async def get_by_id(self, element_id: str, db: Database):
+    async def get_page(self, filter: dict, sort_field: str, per_page: int, cursor, response: Response, db: Database,
+                       projection: dict = None, with_count: bool = False):
+        """
+        Get a keyset page of elements, the next cursor is returned in the X-Next-Cursor header
+        and the total, when asked, in the X-Total-Count header
+        """
+        try:
+            if with_count:
+                elements, next_cursor, total = await self.repo.get_by_and_sort_with_keyset_and_count(
+                    filter, sort_field, per_page, db, cursor, projection=projection)
+                response.headers[TOTAL_COUNT_HEADER] = str(total)
+            else:
+                elements, next_cursor = await self.repo.get_by_and_sort_with_keyset(
+                    filter, sort_field, per_page, db, cursor, projection=projection)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return elements
+
+    async def search(self, text: str, page: int, per_page: int, db: Database, projection: dict = None):
+        """ Search elements by text, best matches first """
+        return await self.repo.search(text, page, per_page, db, projection)
+
+    def stream_all_by(self, filter: dict, model, stream_format: StreamFormat, db: Database, projection: dict = None):
+        """ Stream all elements by filter without materializing the result set """
+        return stream_response(self.repo.iterate(filter, db, projection=projection), model, stream_format)
+
+    def export(self, filter: dict, export_format: ExportFormat, columns: list, db: Database, after=None,
+               compression: ExportCompression = None):
+        """
+        Stream every element matching the filter in _id order as a download, without validation.
+        An export interrupted at any point resumes from the last _id received
+        """
+        if after is not None:
+            filter = {'$and': [filter, {'_id': {'$gt': after}}]} if filter else {'_id': {'$gt': after}}
+        elements = self.repo.iterate(filter, db, sort_field=[('_id', 1)], projection=dict.fromkeys(columns, 1))
+        return export_response(elements, export_format, columns, compression, self.element_name)
+
+    async def get_by_id(self, element_id: str, db: Database, projection: dict = None):
         """ Get an element by id """
-        if (element := await self.repo.get_by_id(element_id, db)) is not None:
+        if (element := await self.repo.get_by_id(element_id, db, projection)) is not None:
             return element
         raise HTTPException(status_code=404, detail=f"{self.element_name} {element_id} not found")
 
@@ -77,25 +293,21 @@ class BasicRouter(object):
                 return True
         return False
 
-    async def patch(self, element_id: str, element: BaseModel, db: Database):
-        """ Update an element """
-        update_ok = await self.update_element(element_id, element, db)
-        if update_ok:
-            if (updated := await self.repo.get_by_id(element_id, db)) is not None:
-                return updated
+    async def patch(self, element_id: str, element: BaseModel, db: Database, if_match: str = None):
+        """ Update an element, when If-Match is given only while its version is one of the named ones """
+        if type(element) is not dict:
+            element = {k: v for k, v in element.dict().items() if v is not None}
+        if len(element) >= 1:
+            return await self._update(element_id, element, db, if_match)
         raise HTTPException(status_code=404, detail=f"{self.element_name} {element_id} not found")
 
-    async def patch_list(self, elements: list, db: Database):
-        """ Update a list of elements """
-        elements = jsonable_encoder(elements)
-        updated = []
-        for element in elements:
-            element_id = element["_id"]
-            await self.update_element(element_id, element, db)
-            if (updated_or_existing := await self.repo.get_by_id(element_id, db)) is not None:
-                updated.append(updated_or_existing)
+    async def patch_list(self, elements: list, db: Database, ordered: bool = True):
+        """ Update a list of elements, return the updated elements and the per element errors """
+        elements = to_document(elements)
+        if self.version_field is not None:
+            version = version_now()
+            for element in elements:
+                element[self.version_field] = version
         if len(elements) >= 1:
-            if len(elements) == len(updated):
-                return updated
-            raise HTTPException(status_code=404, detail=f"{self.element_name}s not complete updated")
+            return await self.repo.bulk_update(elements, db, ordered=ordered)
         raise HTTPException(status_code=404, detail=f"{self.element_name} not found")
@@ -0,0 +1,63 @@
+import base64
+import binascii
+import hashlib
+from datetime import datetime
+from typing import List, Optional
+from bson import json_util
+
+ETAG_HEADER = "ETag"
+ANY_ETAG = "*"
+_JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+
+def version_now() -> datetime:
+    """ Current time truncated to the millisecond precision of BSON dates, so stored and returned versions are equal """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _variant(projection: dict = None) -> str:
+    if not projection:
+        return ""
+    return "." + hashlib.sha1(json_util.dumps(sorted(projection.items())).encode()).hexdigest()[:8]
+
+
+def make_etag(version, projection: dict = None) -> str:
+    """ Strong ETag of one element, the version is kept reversible so If-Match can be turned into a filter """
+    token = base64.urlsafe_b64encode(json_util.dumps(version).encode()).decode().rstrip('=')
+    return f'"{token}{_variant(projection)}"'
+
+
+def make_list_etag(elements: list, version_field: str, projection: dict = None, extra: list = None) -> str:
+    """ Strong ETag of a list, a digest of the ids and versions of its elements plus any extra values sent with it """
+    versions = [[e.get('_id'), e.get(version_field)] for e in elements]
+    digest = hashlib.sha1(json_util.dumps([extra or [], versions]).encode())
+    return f'"{digest.hexdigest()}{_variant(projection)}"'
+
+
+def decode_etag(etag: str):
+    """ Version encoded in an element ETag, raise ValueError when it is not one of ours """
+    token = etag.split('.', 1)[0]
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)), json_options=_JSON_OPTIONS)
+    except (binascii.Error, TypeError, ValueError) as error:
+        raise ValueError("Invalid ETag") from error
+
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    """ Opaque tags of an If-Match or If-None-Match header, without quotes or weak prefix """
+    if not header:
+        return []
+    tags = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tags.append(tag.strip('"'))
+    return [tag for tag in tags if tag]
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """ Whether a If-None-Match header names the given ETag """
+    tags = parse_etags(header)
+    return ANY_ETAG in tags or etag.strip('"') in tags
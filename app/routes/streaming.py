@@ -0,0 +1,175 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Callable, List, Optional, Tuple, Type
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.codecs import dumps_document
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+CSV_MEDIA_TYPE = "text/csv"
+
+_FLUSH_SIZE = 64 * 1024
+_GZIP_LEVEL = 6
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    json = "json"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ExportCompression(str, Enum):
+    gzip = "gzip"
+
+
+def _encoder(model: Type[BaseModel]) -> Callable[[dict], str]:
+    """ Build the function that serializes one database element as the response model would. """
+    def encode(element: dict) -> str:
+        return model.parse_obj(element).json(by_alias=True)
+    return encode
+
+
+async def ndjson_chunks(elements: AsyncIterator[dict], encode: Callable[[dict], str]) -> AsyncIterator[bytes]:
+    """ Serialize elements as newline delimited json, flushing roughly every 64KB. """
+    buffer = []
+    size = 0
+    async for element in elements:
+        line = encode(element)
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= _FLUSH_SIZE:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+
+async def json_array_chunks(elements: AsyncIterator[dict], encode: Callable[[dict], str]) -> AsyncIterator[bytes]:
+    """ Serialize elements as a single json array sent in chunks, flushing roughly every 64KB. """
+    buffer = ["["]
+    size = 1
+    first = True
+    async for element in elements:
+        item = encode(element)
+        if not first:
+            buffer.append(",")
+        first = False
+        buffer.append(item)
+        size += len(item) + 1
+        if size >= _FLUSH_SIZE:
+            yield "".join(buffer).encode()
+            buffer = []
+            size = 0
+    buffer.append("]")
+    yield "".join(buffer).encode()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_size: int = None) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a newline delimited json body into numbered lines as it arrives, blank lines are skipped.
+    A line longer than max_line_size is not buffered, it is yielded as None once its end is reached.
+    """
+    rest = b""
+    number = 0
+    oversized = False
+    async for chunk in chunks:
+        *lines, rest = (rest + chunk).split(b"\n")
+        for line in lines:
+            number += 1
+            if oversized or (max_line_size is not None and len(line) > max_line_size):
+                oversized = False
+                yield number, None
+            elif line.strip():
+                yield number, line
+        if max_line_size is not None and len(rest) > max_line_size:
+            oversized = True
+            rest = b""
+    if oversized:
+        yield number + 1, None
+    elif rest.strip():
+        yield number + 1, rest
+
+
+def stream_response(elements: AsyncIterator[dict], model: Type[BaseModel], stream_format: StreamFormat) -> StreamingResponse:
+    """ Stream elements straight from the cursor, validated against the response model one by one. """
+    encode = _encoder(model)
+    if stream_format == StreamFormat.ndjson:
+        return StreamingResponse(ndjson_chunks(elements, encode), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(json_array_chunks(elements, encode), media_type=JSON_MEDIA_TYPE)
+
+
+async def _chunked(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """ Group encoded lines into chunks of roughly 64KB. """
+    buffer = []
+    size = 0
+    async for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= _FLUSH_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def document_ndjson_lines(elements: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """ Serialize database documents as they are, one json line each. """
+    async for element in elements:
+        yield dumps_document(element) + b"\n"
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return dumps_document(value).decode()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def csv_lines(elements: AsyncIterator[dict], columns: List[str]) -> AsyncIterator[bytes]:
+    """ Serialize database documents as csv rows after a header row, nested values as json cells. """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for element in elements:
+        writer.writerow([_csv_cell(element.get(column)) for column in columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = _GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """ Compress a stream of chunks into one gzip member as they come. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(elements: AsyncIterator[dict], export_format: ExportFormat, columns: List[str],
+                    compression: Optional[ExportCompression], name: str) -> StreamingResponse:
+    """ Stream documents as a downloadable ndjson or csv file, gzip encoded on the fly when asked. """
+    if export_format == ExportFormat.csv:
+        chunks, media_type = _chunked(csv_lines(elements, columns)), CSV_MEDIA_TYPE
+    else:
+        chunks, media_type = _chunked(document_ndjson_lines(elements)), NDJSON_MEDIA_TYPE
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{export_format.value}"'}
+    if compression == ExportCompression.gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from app.core.security import validate_auth
+from app.storages.document_cache import caches
+
+_name = "cache"
+router = APIRouter(
+    prefix=f"/v1/admin/{_name}",
+    tags=[_name],
+    dependencies=[Depends(validate_auth)]
+)
+
+
+@router.get("/", response_description="Document cache counters by collection")
+async def stats():
+    return {name: cache.stats() for name, cache in caches.items()}
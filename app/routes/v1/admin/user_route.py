@@ -1,6 +1,6 @@
-from typing import List, Union
+from typing import List, Optional, Union
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi import Body
 from app.core.hasher import Hasher
 from app.core.security import validate_auth
@@ -8,6 +8,7 @@ from app.storages.database_storage import get_db
 from app.models import UserModel, UpdateUserModel, ShowUserModel, CreateUserModel
 from app.repositories import UserRepository
 from app.routes import BasicRouter
+from app.routes.streaming import StreamFormat
 
 _name = "user"
 router = APIRouter(
@@ -17,35 +18,15 @@ router = APIRouter(
     dependencies=[Depends(validate_auth)]
 )
 _repo = UserRepository()
-_impl = BasicRouter(_repo, _name)
-
-
-def _clean_user(user):
-    """
-    Remove password from user
-    :param user:
-    :return: user without password
-    """
-    del user['password']
-    return user
-
-
-def _clean_users(users):
-    """
-    Remove password from user
-    :param users:
-    :return: users without password
-    """
-    for user in users:
-        _clean_user(user)
-    return users
+_impl = BasicRouter(_repo, _name, version_field='last_update_datetime')
+_SHOW_PROJECTION = {'password': 0}
 
 
 @router.post("/", response_description=f"Add new {_name}", response_model=Union[UserModel, None], status_code=201)
 async def create(user_insert: CreateUserModel = Body(...), db=Depends(get_db)):
     user = user_insert.dict()
     user["last_update_datetime"] = datetime.utcnow().timestamp()
-    user["password"] = Hasher.get_password_hash(user["password"])
+    user["password"] = await Hasher.get_password_hash_async(user["password"])
     if await _repo.exists({'$or': [{"username": user["username"]}, {"email": user["email"]}]}, db):
         raise HTTPException(status_code=409, detail="Already exists")
 
@@ -53,23 +34,28 @@ async def create(user_insert: CreateUserModel = Body(...), db=Depends(get_db)):
 
 
 @router.get("/", response_description=f"List all {_name}s", response_model=Union[List[ShowUserModel], None])
-async def list(db=Depends(get_db)):
-    return _clean_users(await _impl.get_all(db))
+async def list(request: Request, response: Response, stream: Optional[StreamFormat] = None, db=Depends(get_db)):
+    if stream:
+        return _impl.stream_all_by({}, ShowUserModel, stream, db, projection=_SHOW_PROJECTION)
+    return _impl.conditional(await _impl.get_all(db, _SHOW_PROJECTION), request, response, _SHOW_PROJECTION)
 
 
 @router.get("/{id}", response_description=f"Get a single {_name}", response_model=Union[ShowUserModel, None])
-async def show(id: str, db=Depends(get_db)):
-    return _clean_user(await _impl.get_by_id(id, db))
+async def show(id: str, request: Request, response: Response, db=Depends(get_db)):
+    return _impl.conditional(await _impl.get_by_id(id, db, _SHOW_PROJECTION), request, response, _SHOW_PROJECTION)
 
 
 @router.put("/{id}", response_description=f"Update a {_name}", response_model=Union[ShowUserModel, None])
-async def update(id: str, user: UpdateUserModel = Body(...), db=Depends(get_db)):
+async def update(id: str, response: Response, user: UpdateUserModel = Body(...),
+                 if_match: Optional[str] = Header(None, description="Only update while the user has one of these ETags"),
+                 db=Depends(get_db)):
     if user is None or user.password is None:
         raise HTTPException(status_code=409, detail="Invalid user")
-    user.password = Hasher.get_password_hash(user.password)
-    user.last_update_datetime = datetime.utcnow()
+    user.password = await Hasher.get_password_hash_async(user.password)
 
-    return _clean_user(await _impl.put(id, user, db))
+    updated = await _impl.put(id, user, db, _SHOW_PROJECTION, if_match)
+    _impl.tag(updated, response, _SHOW_PROJECTION)
+    return updated
 
 
 @ router.delete("/{id}", response_description=f"Delete a {_name}", status_code=204)
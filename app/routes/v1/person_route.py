@@ -1,10 +1,14 @@
-from app.storages.database_filter import format_to_database_filter
-from fastapi import APIRouter, Depends, Body
-from typing import List
+from app.storages.database_filter import format_fields_to_projection
+from app.storages.filter_compiler import FilterCompiler
+from fastapi import APIRouter, Depends, Body, Header, HTTPException, Query, Request, Response
+from typing import List, Optional
+from app.core.config import settings
 from app.storages.database_storage import Database, get_db
-from app.models.person_model import PersonModel, PersonUpdateModel, filter_to_nested_model, PersonFilterModel
+from app.models.person_model import PersonModel, PersonUpdateModel, PersonFilterModel, PersonSearchModel, PersonSortField
 from app.repositories.person_repository import PersonRepository
 from app.routes import BasicRouter
+from app.routes.basic_router import TOTAL_COUNT_HEADER
+from app.routes.streaming import NDJSON_MEDIA_TYPE, ExportCompression, ExportFormat, StreamFormat
 
 _SHOW_NAME = "person"
 router = APIRouter(
@@ -12,22 +16,68 @@ router = APIRouter(
     tags=[_SHOW_NAME],
     responses={404: {"description": "Not found"}}
 )
-_ROUTER = BasicRouter(PersonRepository(), _SHOW_NAME)
 _MODEL = PersonModel
 _UPDATE_MODEL = PersonUpdateModel
+_ROUTER = BasicRouter(PersonRepository(), _SHOW_NAME, validate_responses=settings.VALIDATE_RESPONSES,
+                      version_field='last_update')
+_LIST_PROJECTION = {name: 1 for name in _UPDATE_MODEL.__fields__}
+_RESPONSE_FIELDS = [field.alias for field in _UPDATE_MODEL.__fields__.values()]
+_SEARCH_FIELDS = [field.alias for field in PersonSearchModel.__fields__.values()]
 _FILTER = PersonFilterModel
+_FILTER_COMPILER = FilterCompiler(_FILTER)
+_EXPORT_COLUMNS = [field.alias for field in _MODEL.__fields__.values()]
+_MAX_PER_PAGE = 1000
+_DEFAULT_PER_PAGE = 50
+
+
+def _projection(fields: Optional[str] = Query(None, description="Comma separated fields to return, all by default")):
+    try:
+        return format_fields_to_projection(fields, _UPDATE_MODEL.__fields__)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
 
 @router.get("/", response_description=f"List all {_SHOW_NAME}s", response_model=List[_UPDATE_MODEL])
-async def list(filter: _FILTER = Depends(_FILTER), db: Database = Depends(get_db)):
-    nested = filter_to_nested_model(filter)
-    db_filter = format_to_database_filter(nested.dict())
-    return await _ROUTER.get_all_by(db_filter, db)
+async def list(request: Request, response: Response, filter: _FILTER = Depends(_FILTER),
+               stream: Optional[StreamFormat] = None,
+               per_page: Optional[int] = Query(None, gt=0, le=_MAX_PER_PAGE), cursor: Optional[str] = None,
+               sort: PersonSortField = PersonSortField.id, projection: Optional[dict] = Depends(_projection),
+               with_count: bool = Query(False, description="Return the total matching the filter in X-Total-Count"),
+               db: Database = Depends(get_db)):
+    db_filter = _FILTER_COMPILER.compile(filter)
+    projection = projection or _LIST_PROJECTION
+    if stream:
+        return _ROUTER.stream_all_by(db_filter, _UPDATE_MODEL, stream, db, projection)
+    if per_page or cursor:
+        page = await _ROUTER.get_page(db_filter, sort.value, per_page or _DEFAULT_PER_PAGE, cursor, response, db,
+                                      _ROUTER.versioned(projection), with_count)
+        return _ROUTER.conditional(page, request, response, projection, _RESPONSE_FIELDS)
+    elements = await _ROUTER.get_all_by(db_filter, db, _ROUTER.versioned(projection))
+    if with_count:
+        response.headers[TOTAL_COUNT_HEADER] = str(len(elements))
+    return _ROUTER.conditional(elements, request, response, projection, _RESPONSE_FIELDS)
+
+
+@router.get("/search", response_description=f"Search {_SHOW_NAME}s by text", response_model=List[PersonSearchModel])
+async def search(q: str = Query(..., min_length=1, max_length=255, description="Words to find in the name, occupation or hobbies"),
+                 page: int = Query(1, gt=0), per_page: int = Query(_DEFAULT_PER_PAGE, gt=0, le=_MAX_PER_PAGE),
+                 projection: Optional[dict] = Depends(_projection), db: Database = Depends(get_db)):
+    return _ROUTER.respond(await _ROUTER.search(q, page, per_page, db, projection or _LIST_PROJECTION),
+                           fields=_SEARCH_FIELDS)
+
+
+@router.get("/export", response_description=f"Export {_SHOW_NAME}s as a stream sorted by _id")
+async def export(filter: _FILTER = Depends(_FILTER), format: ExportFormat = ExportFormat.ndjson,
+                 after: Optional[str] = Query(None, description="Resume after this _id, the last one received"),
+                 compress: Optional[ExportCompression] = None, db: Database = Depends(get_db)):
+    return _ROUTER.export(_FILTER_COMPILER.compile(filter), format, _EXPORT_COLUMNS, db, after, compress)
 
 
 @router.get("/{id}", response_description=f"Get by id {_SHOW_NAME}", response_model=_UPDATE_MODEL)
-async def show_by_id(id: str, db: Database = Depends(get_db)):
-    return await _ROUTER.get_by_id(id, db)
+async def show_by_id(id: str, request: Request, response: Response, projection: Optional[dict] = Depends(_projection),
+                     db: Database = Depends(get_db)):
+    element = await _ROUTER.get_by_id(id, db, _ROUTER.versioned(projection))
+    return _ROUTER.conditional(element, request, response, projection, _RESPONSE_FIELDS)
 
 
 @router.post("/", response_description=f"Add new {_SHOW_NAME}", response_model=_UPDATE_MODEL, status_code=201)
@@ -35,11 +85,22 @@ async def create(model: _MODEL = Body(...), db: Database = Depends(get_db)):
     return await _ROUTER.post(model, db)
 
 
+@router.post("/bulk", response_description=f"Import {_SHOW_NAME}s from newline delimited json",
+             openapi_extra={"requestBody": {"required": True, "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}}}})
+async def bulk(request: Request, db: Database = Depends(get_db)):
+    return await _ROUTER.import_ndjson(request.stream(), _MODEL, db, settings.BULK_IMPORT_CHUNK_SIZE,
+                                       max_line_size=settings.BULK_IMPORT_MAX_LINE_SIZE)
+
+
 @router.delete("/{id}", response_description=f"Delete a {_SHOW_NAME}", status_code=202)
 async def delete(id: str, db: Database = Depends(get_db)):
     return await _ROUTER.delete(id, db)
 
 
 @router.patch("/{id}", response_description=f"Update a {_SHOW_NAME}", response_model=_UPDATE_MODEL)
-async def update(id: str, model: _UPDATE_MODEL = Body(...), db: Database = Depends(get_db)):
-    return await _ROUTER.patch(id, model, db)
+async def update(id: str, response: Response, model: _UPDATE_MODEL = Body(...),
+                 if_match: Optional[str] = Header(None, description="Only update while the person has one of these ETags"),
+                 db: Database = Depends(get_db)):
+    element = await _ROUTER.patch(id, model, db, if_match)
+    _ROUTER.tag(element, response)
+    return _ROUTER.respond(element, response, _RESPONSE_FIELDS)
@@ -1,3 +1,6 @@
+import base64
+import binascii
+from bson import json_util
 from flatdict import FlatterDict
 
 
@@ -27,3 +30,47 @@ def format_pages_to_filter(per_page: int, page: int, filter: list):
     if per_page:
         filter.append({"$skip": per_page * (page - 1)})
         filter.append({"$limit": per_page})
+
+
+def format_fields_to_projection(fields: str, allowed) -> dict:
+    """ Format a comma separated list of fields to a MongoDb projection, raise ValueError on unknown fields. """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return {name: 1 for name in names} or None
+
+
+def encode_cursor(sort_field: str, direction: int, sort_value, last_id) -> str:
+    """ Encode the sort and the last seen sort value and id as an opaque continuation token. """
+    raw = json_util.dumps([sort_field, direction, sort_value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, sort_field: str, direction: int) -> tuple:
+    """ Decode a continuation token, raise ValueError when it is not one of ours or was made for another sort. """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor_field, cursor_direction, sort_value, last_id = json_util.loads(raw)
+    except (binascii.Error, TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+    if cursor_field != sort_field or cursor_direction != direction:
+        raise ValueError("Invalid cursor")
+    return sort_value, last_id
+
+
+def format_keyset_to_filter(filter: dict, sort_field: str, direction: int, sort_value, last_id) -> dict:
+    """ Format a seek filter that continues after (sort_value, last_id) in the given direction. """
+    op = '$gt' if direction > 0 else '$lt'
+    if sort_field == '_id':
+        seek = {'_id': {op: last_id}}
+    else:
+        seek = {'$or': [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, '_id': {op: last_id}},
+        ]}
+    if not filter:
+        return seek
+    return {'$and': [filter, seek]}
@@ -1,13 +1,32 @@
+import asyncio
+import logging
 import certifi
 from typing import Any
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
 from app.core.config import settings
+from app.core.metrics import command_metrics
+from app.storages.pool_monitor import pool_stats
 
 
 Database = AsyncIOMotorDatabase
 
 db_client: Any = None
 ca = certifi.where()
+_logger = logging.getLogger(__name__)
+
+
+def _client_options() -> dict:
+    """Connection pool options from settings."""
+    return {
+        "tlsCAFile": ca,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_stats, command_metrics],
+    }
 
 
 async def get_db_client():
@@ -15,16 +34,47 @@ async def get_db_client():
     return db_client
 
 
-async def connect_db():
-    """Create database connection."""
+def create_client():
+    """Create the client of this process unless it has one, Motor binds it to the event loop on first use."""
+    global db_client
+    if db_client is None:
+        db_client = AsyncIOMotorClient(settings.MONGO_URL, **_client_options())
+    return db_client
+
+
+def close_client():
+    """Close the client of this process, usable outside of the event loop."""
+    global db_client
+    if db_client:
+        db_client.close()
+        db_client = None
+
+
+def discard_client():
+    """Forget a client inherited from the parent process without closing it, its sockets belong to the parent."""
     global db_client
-    db_client = AsyncIOMotorClient(settings.MONGO_URL, tlsCAFile=ca)
+    db_client = None
+    pool_stats.reset()
+
+
+async def connect_db():
+    """Create database connection, the client is set before the first await so concurrent callers share it."""
+    create_client()
+    if settings.MONGO_WARM_UP:
+        await warm_up_db()
+
+
+async def warm_up_db():
+    """Open up to MONGO_MIN_POOL_SIZE connections of this worker before it serves requests."""
+    try:
+        await asyncio.gather(*(db_client.admin.command("ping") for _ in range(max(1, settings.MONGO_MIN_POOL_SIZE))))
+    except PyMongoError as error:
+        _logger.warning("MongoDB warm up failed: %s", error)
 
 
 async def close_db():
     """Close database connection."""
-    if db_client:
-        await db_client.close()
+    close_client()
 
 
 async def get_db() -> Database:
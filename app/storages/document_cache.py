@@ -0,0 +1,121 @@
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+
+class CacheBackend(object):
+    """ Storage used by the repositories read-through cache, keys are (database, id) tuples. """
+
+    def get(self, key) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def begin_read(self, key):
+        """ Start reading a missing key from the database, return the generation to pass to end_read. """
+        raise NotImplementedError
+
+    def end_read(self, key, generation, value=None):
+        """ Finish a read, the value is cached unless the key was deleted or the cache cleared since it began. """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In process LRU cache with a TTL per entry.
+    Each worker keeps its own copy, so writes made by other workers are only seen after the TTL.
+    Generations are only kept for keys with a read in flight, a delete during that read bumps it.
+    """
+    __slots__ = ['max_size', 'ttl', '_entries', 'hits', 'misses', 'evictions', 'expirations',
+                 '_epoch', '_generations', '_readers']
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self._epoch: int = 0
+        self._generations: Dict[Any, int] = {}
+        self._readers: Dict[Any, int] = {}
+
+    def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+        if key in self._readers:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self._epoch += 1
+
+    def begin_read(self, key) -> tuple:
+        self._readers[key] = self._readers.get(key, 0) + 1
+        return self._epoch, self._generations.get(key, 0)
+
+    def end_read(self, key, generation, value=None):
+        if value is not None and generation == (self._epoch, self._generations.get(key, 0)):
+            self.set(key, value)
+        readers = self._readers[key] - 1
+        if readers:
+            self._readers[key] = readers
+        else:
+            del self._readers[key]
+            self._generations.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+caches: Dict[str, CacheBackend] = {}
+
+
+def get_cache(name: str) -> Optional[CacheBackend]:
+    """ Return the shared cache for a repository, None when the document cache is disabled. """
+    if settings.DOCUMENT_CACHE_MAX_SIZE <= 0:
+        return None
+    if name not in caches:
+        caches[name] = MemoryCacheBackend(settings.DOCUMENT_CACHE_MAX_SIZE, settings.DOCUMENT_CACHE_TTL)
+    return caches[name]
@@ -0,0 +1,54 @@
+import re
+from typing import Tuple, Type
+from pydantic import BaseModel
+
+EQUAL = 'eq'
+PREFIX = 'prefix'
+IN = '$in'
+
+
+def _prefix(value: str) -> str:
+    """ Anchored, case sensitive regex so MongoDb can bound the index scan. """
+    return '^' + re.escape(value)
+
+
+def _split(value: str) -> list:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class FilterCompiler(object):
+    """
+    Turn a validated filter model straight into a MongoDb query.
+    The database path and operator of every field are read once from the model, a field declares them
+    with Field(path='friends.name', op='$gte'), op is 'eq' (default), 'prefix', '$in' for a comma separated
+    value, or any comparison operator. Fields sharing a path are merged, unset and empty values are left out.
+    """
+    __slots__ = ['fields']
+
+    def __init__(self, model: Type[BaseModel]):
+        self.fields: Tuple[Tuple[str, str, str], ...] = tuple(
+            (name, field.field_info.extra.get('path', name), field.field_info.extra.get('op', EQUAL))
+            for name, field in model.__fields__.items())
+
+    def compile(self, filter: BaseModel) -> dict:
+        """ Build the query of a filter instance. """
+        values = filter.__dict__
+        query = {}
+        for name, path, op in self.fields:
+            value = values[name]
+            if value is None or value == '':
+                continue
+            if op == EQUAL:
+                op = '$eq'
+            elif op == PREFIX:
+                op, value = '$regex', _prefix(value)
+            elif op == IN:
+                value = _split(value)
+            current = query.get(path)
+            if current is None:
+                query[path] = value if op == '$eq' else {op: value}
+            elif isinstance(current, dict):
+                current[op] = value
+            else:
+                query[path] = {'$eq': current, op: value}
+        return query
@@ -0,0 +1,144 @@
+import asyncio
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.storages.database_storage import Database
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """ Lower case words of a text. """
+    return _TOKEN.findall(text.lower())
+
+
+class InvertedIndex(object):
+    """
+    Postings of weighted term frequencies by token, a search only reads the postings of the query tokens.
+    Scores are weighted term frequency times idf, close to the ranking of a MongoDb text index.
+    """
+    __slots__ = ['weights', '_postings', '_documents']
+
+    def __init__(self, weights: Dict[str, int]):
+        self.weights: Dict[str, int] = weights
+        self._postings: Dict[str, Dict] = defaultdict(dict)
+        self._documents: Dict = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _field_text(self, element: dict, field: str) -> str:
+        value = element.get(field)
+        if isinstance(value, (list, tuple)):
+            return " ".join(str(item) for item in value)
+        return "" if value is None else str(value)
+
+    def add(self, element: dict):
+        """ Index an element, replacing its previous version. """
+        id = element['_id']
+        self.remove(id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, weight in self.weights.items():
+            for token in tokenize(self._field_text(element, field)):
+                frequencies[token] += weight
+        for token, frequency in frequencies.items():
+            self._postings[token][id] = frequency
+        self._documents[id] = tuple(frequencies)
+
+    def remove(self, id):
+        """ Drop an element from the index. """
+        for token in self._documents.pop(id, ()):
+            postings = self._postings[token]
+            postings.pop(id, None)
+            if not postings:
+                del self._postings[token]
+
+    def search(self, text: str, limit: int) -> List[Tuple[object, float]]:
+        """ Best `limit` (id, score) pairs for the query, any query token matches. """
+        scores: Dict = defaultdict(float)
+        total = len(self._documents)
+        for token in set(tokenize(text)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for id, frequency in postings.items():
+                scores[id] += frequency * idf
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class MemoryTextSearch(object):
+    """
+    In process text search of a collection for the local and mock backends.
+    The index of each database is built on the first search, then writes made through the
+    repository mark their ids dirty and only those are read again before the next search.
+    Writes made while the index builds are marked too and read again once the scan is done.
+    """
+    __slots__ = ['collection', 'weights', 'fallback', '_indexes', '_dirty', '_locks']
+
+    def __init__(self, collection: str, weights: Dict[str, int], fallback: bool = False):
+        self.collection: str = collection
+        self.weights: Dict[str, int] = weights
+        self.fallback: bool = fallback
+        self._indexes: Dict[str, InvertedIndex] = {}
+        self._dirty: Dict[str, Optional[set]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def changed(self, db: Database, *ids):
+        """ Mark elements as changed, all of them when no id is given, from the moment an index starts building. """
+        if db.name not in self._dirty or self._dirty[db.name] is None:
+            return
+        if not ids:
+            self._indexes.pop(db.name, None)
+            self._dirty[db.name] = None
+            return
+        self._dirty[db.name].update(ids)
+
+    def clear(self):
+        """ Drop the indexes of every database, they are built again on the next search. """
+        self._indexes.clear()
+        self._dirty.clear()
+        self._locks.clear()
+
+    async def _index(self, db: Database) -> InvertedIndex:
+        lock = self._locks.setdefault(db.name, asyncio.Lock())
+        async with lock:
+            index: Optional[InvertedIndex] = self._indexes.get(db.name)
+            while index is None:
+                self._dirty[db.name] = set()
+                index = InvertedIndex(self.weights)
+                async for element in db[self.collection].find({}, dict.fromkeys(self.weights, 1)):
+                    index.add(element)
+                if self._dirty.get(db.name) is None:
+                    index = None
+            self._indexes[db.name] = index
+            if dirty := self._dirty[db.name]:
+                self._dirty[db.name] = set()
+                ids = list(dirty)
+                for id in ids:
+                    index.remove(id)
+                async for element in db[self.collection].find({'_id': {'$in': ids}}, dict.fromkeys(self.weights, 1)):
+                    index.add(element)
+            return index
+
+    async def search(self, db: Database, text: str, limit: int) -> List[Tuple[object, float]]:
+        """ Best `limit` (id, score) pairs for the query. """
+        return (await self._index(db)).search(text, limit)
+
+
+text_searches: Dict[str, MemoryTextSearch] = {}
+
+
+def get_text_search(name: str, weights: Dict[str, int]) -> Optional[MemoryTextSearch]:
+    """
+    Return the shared in process text search of a collection, None when only the MongoDb text index is used.
+    In auto mode it is only a fallback for the backends without $text support.
+    """
+    if settings.SEARCH_BACKEND == "mongo":
+        return None
+    if name not in text_searches:
+        text_searches[name] = MemoryTextSearch(name, weights, fallback=settings.SEARCH_BACKEND == "auto")
+    return text_searches[name]
@@ -0,0 +1,60 @@
+"""
+CPU time spent versus bytes saved by each available encoding and level, on the payloads the routes serve:
+a person list as one json body and an export as newline delimited json compressed chunk by chunk.
+
+    python -m benchmarks.compression
+"""
+import time
+from app.codecs import dumps_document
+from app.middlewares.compression import ENCODERS
+from benchmarks.json_response import person_documents
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9, 19)}
+_CHUNK = 64 * 1024
+
+
+def payloads(size: int = 5000) -> dict:
+    documents = person_documents(size)
+    return {
+        "json list": dumps_document(documents),
+        "ndjson stream": b"".join(dumps_document(document) + b"\n" for document in documents),
+    }
+
+
+def cpu_ms(compress) -> tuple:
+    """ Best process time of a few runs and the compressed size. """
+    best = None
+    for _ in range(3):
+        start = time.process_time()
+        size = compress()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, size
+
+
+def one_shot(encoding: str, level: int, body: bytes):
+    return lambda: len(ENCODERS[encoding][0](body, level))
+
+
+def streamed(encoding: str, level: int, body: bytes):
+    def run():
+        stream = ENCODERS[encoding][1](level)
+        size = sum(len(stream.compress(body[i:i + _CHUNK])) for i in range(0, len(body), _CHUNK))
+        return size + len(stream.finish())
+    return run
+
+
+def main():
+    print(f"{'payload':<14} {'encoding':<6} {'level':>5} {'cpu ms':>9} {'ratio':>7} {'saved KiB':>10} {'KiB saved/cpu ms':>17}")
+    for name, body in payloads().items():
+        compress = streamed if name.endswith("stream") else one_shot
+        for encoding in ENCODERS:
+            for level in LEVELS[encoding]:
+                elapsed, size = cpu_ms(compress(encoding, level, body))
+                saved = (len(body) - size) / 1024
+                print(f"{name:<14} {encoding:<6} {level:>5} {elapsed:>9.2f} {len(body) / size:>6.1f}x "
+                      f"{saved:>10.0f} {saved / max(elapsed, 0.001):>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
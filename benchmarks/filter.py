@@ -0,0 +1,39 @@
+"""
+Per request overhead of building the person list query, nested model and FlatterDict
+against the compiled filter.
+
+    python -m benchmarks.filter
+"""
+import timeit
+from app.models.person_model import PersonFilterModel, filter_to_nested_model
+from app.storages.database_filter import format_to_database_filter
+from app.storages.filter_compiler import FilterCompiler
+
+_COMPILER = FilterCompiler(PersonFilterModel)
+
+FILTERS = {
+    "empty": PersonFilterModel(),
+    "name": PersonFilterModel(name="Jack"),
+    "name+hobby+occupation": PersonFilterModel(name="Jack", hobby="Sleeping", occupation="King"),
+}
+
+
+def nested_path(filter: PersonFilterModel) -> dict:
+    return format_to_database_filter(filter_to_nested_model(filter).dict())
+
+
+def compiled_path(filter: PersonFilterModel) -> dict:
+    return _COMPILER.compile(filter)
+
+
+def main():
+    number = 20_000
+    print(f"{'filter':<24} {'nested us':>10} {'compiled us':>12} {'speedup':>8}")
+    for name, filter in FILTERS.items():
+        nested = min(timeit.repeat(lambda: nested_path(filter), number=number, repeat=5)) / number
+        compiled = min(timeit.repeat(lambda: compiled_path(filter), number=number, repeat=5)) / number
+        print(f"{name:<24} {nested * 1e6:>10.2f} {compiled * 1e6:>12.2f} {nested / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
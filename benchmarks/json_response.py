@@ -0,0 +1,63 @@
+"""
+Compare the default response path (response model validation, jsonable_encoder, stdlib json)
+with MongoJSONResponse serializing the database documents directly.
+
+    python -m benchmarks.json_response
+"""
+import asyncio
+import timeit
+from datetime import datetime
+from typing import List
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.codecs import MongoJSONResponse
+from app.models.person_model import PersonUpdateModel
+
+SIZES = (1, 100, 10_000)
+
+
+def person_documents(n: int) -> list:
+    """ Person documents as they come out of Motor. """
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "name": f"Person {i}",
+        "age": "42",
+        "occupation": "King of the world",
+        "hobbies": ["Sleeping", "Eating", "Being a jack of all trades"],
+        "friends": [
+            {"name": "Jill", "age": 42, "occupation": "King of another world"},
+            {"name": "Jane", "age": 50, "occupation": "Queen of another world"},
+        ],
+        "created_at": now,
+        "last_update": now,
+    } for i in range(n)]
+
+
+_FIELD = create_response_field(name="response", type_=List[PersonUpdateModel])
+_LOOP = asyncio.new_event_loop()
+
+
+def validated_path(documents: list) -> bytes:
+    content = _LOOP.run_until_complete(serialize_response(field=_FIELD, response_content=documents))
+    return JSONResponse(content).body
+
+
+def raw_path(documents: list) -> bytes:
+    return MongoJSONResponse(documents).body
+
+
+def main():
+    print(f"{'documents':>10} {'validated ms':>14} {'raw ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        documents = person_documents(size)
+        number = max(1, 2000 // size)
+        validated = min(timeit.repeat(lambda: validated_path(documents), number=number, repeat=5)) / number
+        raw = min(timeit.repeat(lambda: raw_path(documents), number=number, repeat=5)) / number
+        print(f"{size:>10} {validated * 1000:>14.3f} {raw * 1000:>10.3f} {validated / raw:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Drive every person and admin user route through the ASGI app and report throughput,
+p50/p95/p99 latency and allocated KiB per request.
+
+    python -m benchmarks.routes --concurrency 20 --requests 500 --dataset 5000 --output bench.json
+    python -m benchmarks.routes --baseline bench.json --tolerance 0.2
+
+Runs against mongomock by default, pass --mongo-url to measure against a real MongoDB.
+The run exits with status 1 when a route regresses against the baseline beyond the tolerance.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from typing import Callable, Dict, List, NamedTuple
+import httpx
+from bson.objectid import ObjectId
+from app.core.config import settings
+from app.core.hasher import Hasher
+from app.main import get_application
+from app.models.examples.person_example import example as person_example
+from app.models.examples.user_example import basic_request_example
+from app.repositories import PersonRepository, UserRepository
+from app.storages.database_storage import get_db
+
+_ALLOCATION_SAMPLES = 50
+
+
+class Scenario(NamedTuple):
+    name: str
+    request: Callable[[int], tuple]
+
+
+def _new_id() -> str:
+    return str(ObjectId())
+
+
+def _person(i: int) -> dict:
+    person = deepcopy(person_example)
+    person["_id"] = _new_id()
+    person["name"] = f"Person {i}"
+    person["age"] = 18 + i % 60
+    return person
+
+
+def _person_rows(i: int, rows: int = 100) -> str:
+    return "\n".join(json.dumps(_person(i * rows + j)) for j in range(rows))
+
+
+async def seed(db, dataset: int, requests: int) -> dict:
+    """ Insert the dataset plus the documents consumed by the delete scenarios and their allocation samples. """
+    persons = [_person(i) for i in range(dataset)]
+    spare_persons = [_person(i) for i in range(requests + _ALLOCATION_SAMPLES)]
+    await PersonRepository().insert_many(persons + spare_persons, db)
+
+    admin = dict(basic_request_example, _id=_new_id())
+    admin["password"] = Hasher.get_password_hash(admin["password"])
+    users = [{"_id": _new_id(), "username": f"user{i}", "email": f"user{i}@example.com",
+              "password": admin["password"]} for i in range(requests + _ALLOCATION_SAMPLES + 1)]
+    await UserRepository().insert_many([admin] + users, db)
+    return {
+        "person_ids": [person["_id"] for person in persons],
+        "spare_person_ids": [person["_id"] for person in spare_persons],
+        "user_id": users[0]["_id"],
+        "spare_user_ids": [user["_id"] for user in users[1:]],
+    }
+
+
+def scenarios(ids: dict) -> List[Scenario]:
+    """ One scenario per route and main query mode. """
+    person_ids = ids["person_ids"]
+    auth = f"{basic_request_example['username']}:{basic_request_example['password']}".encode()
+    admin = {"Authorization": "Basic " + base64.b64encode(auth).decode(), "x-token": settings.API_TOKEN}
+
+    def person(i):
+        return person_ids[i % len(person_ids)]
+
+    return [
+        Scenario("person.list", lambda i: ("GET", "/v1/person/", {})),
+        Scenario("person.list.filter", lambda i: ("GET", "/v1/person/?hobby=Sleeping&name=Person%201", {})),
+        Scenario("person.list.page", lambda i: ("GET", "/v1/person/?per_page=50&sort=name&with_count=true", {})),
+        Scenario("person.list.stream", lambda i: ("GET", "/v1/person/?stream=ndjson", {})),
+        Scenario("person.export", lambda i: ("GET", "/v1/person/export", {})),
+        Scenario("person.export.csv.gzip", lambda i: ("GET", "/v1/person/export?format=csv&compress=gzip", {})),
+        Scenario("person.search", lambda i: ("GET", f"/v1/person/search?q=Person+{i % 100}&per_page=20", {})),
+        Scenario("person.show", lambda i: ("GET", f"/v1/person/{person(i)}", {})),
+        Scenario("person.show.fields", lambda i: ("GET", f"/v1/person/{person(i)}?fields=name,age", {})),
+        Scenario("person.create", lambda i: ("POST", "/v1/person/", {"json": _person(i)})),
+        Scenario("person.bulk", lambda i: ("POST", "/v1/person/bulk", {
+            "content": _person_rows(i), "headers": {"Content-Type": "application/x-ndjson"}})),
+        Scenario("person.update", lambda i: ("PATCH", f"/v1/person/{person(i)}", {"json": {"occupation": f"Job {i}"}})),
+        Scenario("person.delete", lambda i: ("DELETE", f"/v1/person/{ids['spare_person_ids'][i]}", {})),
+        Scenario("user.list", lambda i: ("GET", "/v1/admin/user/", {"headers": admin})),
+        Scenario("user.show", lambda i: ("GET", f"/v1/admin/user/{ids['user_id']}", {"headers": admin})),
+        Scenario("user.create", lambda i: ("POST", "/v1/admin/user/", {"headers": admin, "json": {
+            "username": f"bench{i}x{time.monotonic_ns()}", "password": "a_bench_password",
+            "email": f"bench{i}x{time.monotonic_ns()}@example.com"}})),
+        Scenario("user.update", lambda i: ("PUT", f"/v1/admin/user/{ids['user_id']}", {
+            "headers": admin, "json": {"password": "a_bench_password"}})),
+        Scenario("user.delete", lambda i: ("DELETE", f"/v1/admin/user/{ids['spare_user_ids'][i]}", {"headers": admin})),
+    ]
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    """
+    Send the scenario requests with bounded concurrency, then sample allocations sequentially.
+    The samples continue the request numbers, so writes get fresh payloads and ids not consumed yet.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = scenario.request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    allocated = []
+    tracemalloc.start()
+    for i in range(requests, requests + _ALLOCATION_SAMPLES):
+        method, url, kwargs = scenario.request(i)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await client.request(method, url, **kwargs)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "alloc_kib_per_request": statistics.mean(allocated) / 1024 if allocated else None,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """ List the routes slower than the baseline beyond the tolerance, or failing more requests than it. """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f}/s < baseline {base['throughput']:.1f}/s")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f}ms > baseline {base['p95_ms']:.2f}ms")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} errors > baseline {base.get('errors', 0)}")
+    return regressions
+
+
+async def main(args) -> int:
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    db = client[f"benchmark_{ObjectId()}"]
+
+    app = get_application()
+
+    async def _get_benchmark_db():
+        yield db
+
+    app.dependency_overrides[get_db] = _get_benchmark_db
+    try:
+        ids = await seed(db, args.dataset, args.requests)
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+            for scenario in scenarios(ids):
+                if args.only and not scenario.name.startswith(args.only):
+                    continue
+                results[scenario.name] = await run_scenario(http, scenario, args.requests, args.concurrency)
+                r = results[scenario.name]
+                print(f"{scenario.name:<22} {r['throughput']:>9.1f}/s  p50 {r['p50_ms']:>7.2f}ms  "
+                      f"p95 {r['p95_ms']:>7.2f}ms  p99 {r['p99_ms']:>7.2f}ms  errors {r['errors']}")
+    finally:
+        await client.drop_database(db.name)
+
+    report = {
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "dataset": args.dataset,
+                   "backend": "mongodb" if args.mongo_url else "mongomock"},
+        "routes": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["routes"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--dataset", type=int, default=1000, help="persons in the collection")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--only", default=None, help="run the scenarios whose name starts with this prefix")
+    parser.add_argument("--output", default=None, help="write the results as json")
+    parser.add_argument("--baseline", default=None, help="fail on regressions against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(_parse_args())))
@@ -0,0 +1,93 @@
+"""
+Measure a worker cold start: import time per module, application build time and the first requests,
+each run in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 5
+    OPENAPI_SCHEMA_FILE=openapi.json python -m benchmarks.startup
+
+Pass --top to list more of the slowest modules by cumulative import time.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+_FIRST_REQUESTS = """
+import asyncio, json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+application = app.main.get_application()
+built = time.perf_counter()
+import httpx
+
+async def first_requests():
+    timings = {}
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for path in ("/", "/openapi.json", "/openapi.json"):
+            begin = time.perf_counter()
+            await client.get(path)
+            timings.setdefault(path, []).append(time.perf_counter() - begin)
+    return timings
+
+timings = asyncio.run(first_requests())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "build_ms": (built - imported) * 1000,
+    "first_request_ms": timings["/"][0] * 1000,
+    "first_openapi_ms": timings["/openapi.json"][0] * 1000,
+    "next_openapi_ms": timings["/openapi.json"][1] * 1000,
+}))
+"""
+
+
+def import_times() -> dict:
+    """ Self and cumulative import microseconds by module, parsed from -X importtime. """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def first_requests() -> dict:
+    result = subprocess.run([sys.executable, "-c", _FIRST_REQUESTS], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main(args) -> int:
+    cumulative = defaultdict(list)
+    for _ in range(args.runs):
+        for name, (_, cumulative_us) in import_times().items():
+            cumulative[name].append(cumulative_us)
+    print(f"{'module':<50} {'cumulative ms':>14}")
+    slowest = sorted(cumulative.items(), key=lambda item: -statistics.median(item[1]))
+    for name, values in [item for item in slowest if item[0].startswith("app")][:args.top]:
+        print(f"{name:<50} {statistics.median(values) / 1000:>14.1f}")
+    print()
+    for name, values in [item for item in slowest if not item[0].startswith("app")][:args.top]:
+        print(f"{name:<50} {statistics.median(values) / 1000:>14.1f}")
+
+    runs = [first_requests() for _ in range(args.runs)]
+    print()
+    for key in runs[0]:
+        print(f"{key:<50} {statistics.median(run[key] for run in runs):>14.1f}")
+    return 0
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measure, medians are reported")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules listed, app and dependencies")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(_parse_args()))
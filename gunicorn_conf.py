@@ -1,6 +1,8 @@
+import gc
 import json
 import multiprocessing
 import os
+import shutil
 
 workers_per_core_str = os.getenv("WORKERS_PER_CORE", "2")
 max_workers_str = os.getenv("MAX_WORKERS")
@@ -35,10 +37,19 @@ use_errorlog = errorlog_var or None
 graceful_timeout_str = os.getenv("GRACEFUL_TIMEOUT", "30")
 timeout_str = os.getenv("TIMEOUT", "120")
 keepalive_str = os.getenv("KEEP_ALIVE", "10")
+preload_app_str = os.getenv("PRELOAD_APP", "false")
+max_requests_str = os.getenv("MAX_REQUESTS", "10000")
+max_requests_jitter_str = os.getenv("MAX_REQUESTS_JITTER", "1000")
 
 worker_refresh_batch_size = 0
 worker_refresh_interval = 0
 
+# Every worker writes its metrics here so /metrics aggregates all of them
+prometheus_multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/dev/shm/prometheus_multiproc")
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = prometheus_multiproc_dir
+# A preloaded application creates its metric files before on_starting, workers open their own after the fork
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
 # Gunicorn config variables
 loglevel = use_loglevel
 workers = web_concurrency
@@ -49,6 +60,53 @@ accesslog = use_accesslog
 graceful_timeout = int(graceful_timeout_str)
 timeout = int(timeout_str)
 keepalive = int(keepalive_str)
+# Import the application once in the master, workers share its pages until they write to them
+preload_app = preload_app_str.lower() in ("1", "true", "yes")
+# Recycle workers after a jittered number of requests so memory growth is bounded and they do not restart together
+max_requests = int(max_requests_str)
+max_requests_jitter = int(max_requests_jitter_str)
+
+if preload_app:
+    # No collection in the master while it imports the application, it would leave holes in shared pages
+    gc.disable()
+
+
+def on_starting(server):
+    """Start from empty metric files, they belong to workers of a previous run."""
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    """Collect again in the master once the application is preloaded, its own garbage is not shared with workers."""
+    if preload_app:
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    """Move the preloaded objects to the permanent generation, collections in workers will not touch their pages."""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Give the worker its own state and MongoDB client, a client must never be shared across a fork."""
+    if preload_app:
+        gc.enable()
+    from app.core.workers import init_worker
+    init_worker()
+
+
+def worker_exit(server, worker):
+    """Close the MongoDB client of the exiting worker."""
+    from app.core.workers import exit_worker
+    exit_worker()
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a dead worker so in flight requests are not counted twice."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
 
 
 # For debugging and testing
@@ -59,6 +117,9 @@ log_data = {
     "graceful_timeout": graceful_timeout,
     "timeout": timeout,
     "keepalive": keepalive,
+    "preload_app": preload_app,
+    "max_requests": max_requests,
+    "max_requests_jitter": max_requests_jitter,
     "errorlog": errorlog,
     "accesslog": accesslog,
     # Additional, non-gunicorn variables
@@ -66,5 +127,6 @@ log_data = {
     "use_max_workers": use_max_workers,
     "host": host,
     "port": port,
+    "prometheus_multiproc_dir": prometheus_multiproc_dir,
 }
 print(json.dumps(log_data))
@@ -0,0 +1,29 @@
+import json
+from datetime import datetime
+from bson.objectid import ObjectId
+from app.codecs import MongoJSONResponse
+from app.models.person_model import Friend
+from app.repositories.person_repository import PersonRepository
+from app.routes import BasicRouter
+
+
+def test_render_database_types():
+    id = ObjectId()
+    body = MongoJSONResponse({
+        '_id': id,
+        'created_at': datetime(2020, 1, 1, 10, 30),
+        'friends': [Friend(name='Jill', age=42)],
+    }).body
+    assert json.loads(body) == {
+        '_id': str(id),
+        'created_at': '2020-01-01T10:30:00',
+        'friends': [{'name': 'Jill', 'age': 42, 'occupation': None}],
+    }
+
+
+def test_router_skips_validation_when_disabled():
+    documents = [{'_id': 'a', 'name': 'test'}]
+    assert BasicRouter(PersonRepository()).respond(documents) is documents
+    response = BasicRouter(PersonRepository(), validate_responses=False).respond(documents)
+    assert isinstance(response, MongoJSONResponse)
+    assert json.loads(response.body) == documents
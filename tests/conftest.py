@@ -10,6 +10,7 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from mongomock_motor import AsyncMongoMockClient
 from app.storages.database_storage import Database, get_db
+from app.core.security import limit_rate
 from app.main import get_application
 from app.models.examples.user_example import basic_request_example, example
 
@@ -22,9 +23,14 @@ def app() -> Generator[FastAPI, Any, None]:
     Create a new FastAPI application.
     """
     _app = get_application()
+    _app.dependency_overrides[limit_rate] = _no_rate_limit
     yield _app
 
 
+async def _no_rate_limit():
+    """ Tests make many requests at once from the same client, they are not rate limited. """
+
+
 @pytest.fixture(scope="module")
 def client(app: FastAPI, db) -> Generator[TestClient, Any, None]:
     """
@@ -0,0 +1,41 @@
+from app.core.hasher import Hasher, VerifiedCredentialCache, verified_cache
+
+_PASSWORD = 'a_strong_password'
+
+
+async def test_hash_and_verify_async():
+    hashed = await Hasher.get_password_hash_async(_PASSWORD)
+    assert await Hasher.verify_password_async(_PASSWORD, hashed) is True
+    assert await Hasher.verify_password_async('wrong_password', hashed) is False
+
+
+async def test_verify_async_caches_only_successes():
+    verified_cache.clear()
+    hashed = Hasher.get_password_hash(_PASSWORD)
+    await Hasher.verify_password_async('wrong_password', hashed)
+    assert not verified_cache.contains('wrong_password', hashed)
+    await Hasher.verify_password_async(_PASSWORD, hashed)
+    assert verified_cache.contains(_PASSWORD, hashed)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = VerifiedCredentialCache(max_size=2, ttl=60)
+    cache.add('a', 'h')
+    cache.add('b', 'h')
+    assert cache.contains('a', 'h')
+    cache.add('c', 'h')
+    assert cache.contains('a', 'h')
+    assert not cache.contains('b', 'h')
+    assert cache.contains('c', 'h')
+
+
+def test_cache_entries_expire():
+    cache = VerifiedCredentialCache(max_size=2, ttl=0.000001)
+    cache.add('a', 'h')
+    assert not cache.contains('a', 'h')
+
+
+def test_cache_is_keyed_by_stored_hash():
+    cache = VerifiedCredentialCache(max_size=2, ttl=60)
+    cache.add('a', 'old_hash')
+    assert not cache.contains('a', 'new_hash')
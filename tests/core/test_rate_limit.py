@@ -0,0 +1,61 @@
+import pytest
+from fastapi import HTTPException
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import MemoryRateLimitBackend, MongoRateLimitBackend
+from app.core.security import get_token_app_header, limit_rate
+
+
+async def test_memory_bucket_allows_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    limiter = MemoryRateLimitBackend(rate=2, burst=3, max_keys=10)
+    assert [await limiter.take('a', None) for _ in range(3)] == [0, 0, 0]
+    assert await limiter.take('a', None) == pytest.approx(0.5)
+    assert await limiter.take('b', None) == 0
+    now[0] += 0.5
+    assert await limiter.take('a', None) == 0
+    assert await limiter.take('a', None) > 0
+
+
+async def test_memory_buckets_are_bounded():
+    limiter = MemoryRateLimitBackend(rate=1, burst=1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        await limiter.take(key, None)
+    assert await limiter.take('a', None) == 0
+    assert await limiter.take('c', None) > 0
+
+
+async def test_mongo_bucket_is_shared(db):
+    first, second = MongoRateLimitBackend(rate=1, burst=2), MongoRateLimitBackend(rate=1, burst=2)
+    assert await first.take('shared', db) == 0
+    assert await second.take('shared', db) == 0
+    assert 0 < await first.take('shared', db) <= 1
+    await db['rate_limit'].drop()
+
+
+async def test_token_app_header_is_rate_limited(monkeypatch, db):
+    monkeypatch.setattr(rate_limit, 'rate_limiter', MemoryRateLimitBackend(rate=0.5, burst=1, max_keys=10))
+    await get_token_app_header(settings.API_TOKEN, 'app', 'client', db)
+    await get_token_app_header(settings.API_TOKEN, 'other app', 'client', db)
+    with pytest.raises(HTTPException) as error:
+        await get_token_app_header(settings.API_TOKEN, 'app', 'client', db)
+    assert error.value.status_code == 429
+    assert error.value.headers['Retry-After'] == '2'
+
+
+async def test_client_and_identifier_do_not_collide(monkeypatch, db):
+    monkeypatch.setattr(rate_limit, 'rate_limiter', MemoryRateLimitBackend(rate=0.5, burst=1, max_keys=10))
+    await get_token_app_header(settings.API_TOKEN, 'b', 'a/', db)
+    await get_token_app_header(settings.API_TOKEN, '/b', 'a', db)
+
+
+def test_person_routes_are_rate_limited(app, client, monkeypatch):
+    monkeypatch.delitem(app.dependency_overrides, limit_rate)
+    monkeypatch.setattr(rate_limit, 'rate_limiter', MemoryRateLimitBackend(rate=0.5, burst=1, max_keys=10))
+    assert client.get('/v1/person/', headers={'client': 'limited'}).status_code == 200
+    response = client.get('/v1/person/', headers={'client': 'limited'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '2'
+    assert client.get('/v1/person/', headers={'client': 'other'}).status_code == 200
+    assert client.get('/v1/person/').status_code == 200
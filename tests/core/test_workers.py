@@ -0,0 +1,61 @@
+import asyncio
+from app.core import rate_limit
+from app.core.rate_limit import MemoryRateLimitBackend
+from app.core.workers import exit_worker, init_worker
+from app.middlewares.compression import CompressionMiddleware
+from app.repositories.batch_loader import BatchLoader, loaders
+from app.repositories.write_coalescer import WriteCoalescer, coalescers
+from app.storages import database_storage
+from app.storages.document_cache import MemoryCacheBackend, caches
+from app.storages.pool_monitor import pool_stats
+
+
+def test_worker_gets_its_own_client_and_empty_state(monkeypatch):
+    inherited = object()
+    monkeypatch.setattr(database_storage, "db_client", inherited)
+    monkeypatch.setitem(caches, "workers_test", MemoryCacheBackend(10, 60))
+    caches["workers_test"].set("a", {"_id": "a"})
+    pool_stats.connection_created(None)
+
+    init_worker()
+    client = database_storage.db_client
+    assert client is not None and client is not inherited
+    assert caches["workers_test"].stats()["size"] == 0
+    assert pool_stats.stats()["open"] == 0
+
+    exit_worker()
+    assert database_storage.db_client is None
+
+
+async def test_worker_forgets_inherited_batches(monkeypatch, db):
+    loader, coalescer = BatchLoader("workers_test"), WriteCoalescer("workers_test", max_delay=60)
+    monkeypatch.setitem(loaders, "workers_test", loader)
+    monkeypatch.setitem(coalescers, "workers_test", coalescer)
+    loading = asyncio.ensure_future(loader.load("a", db))
+    inserting = asyncio.ensure_future(coalescer.insert({"_id": "a"}, db))
+    await asyncio.sleep(0)
+
+    init_worker()
+    assert (loader._futures, loader._pending, loader._tasks) == ({}, {}, set())
+    assert (coalescer._pending, coalescer._tasks) == ({}, set())
+    loading.cancel()
+    inserting.cancel()
+    exit_worker()
+
+
+async def test_worker_empties_rate_limit_buckets(monkeypatch, db):
+    monkeypatch.setattr(rate_limit, "rate_limiter", MemoryRateLimitBackend(rate=0.5, burst=1, max_keys=10))
+    await rate_limit.rate_limiter.take("client", db)
+
+    init_worker()
+    assert await rate_limit.get_rate_limiter().take("client", db) == 0
+    exit_worker()
+
+
+async def test_worker_empties_compressed_caches():
+    middleware = CompressionMiddleware(None, cache_size=10)
+    middleware.cache.set("key", b"body")
+
+    init_worker()
+    assert middleware.cache.get("key") is None
+    exit_worker()
@@ -0,0 +1,71 @@
+import os
+from typing import Any, Generator
+import pytest
+from bson import objectid
+from motor.motor_asyncio import AsyncIOMotorClient
+
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL")
+
+
+@pytest.fixture(scope="module")
+def mongo_db() -> Generator[Any, Any, None]:
+    """
+    Real MongoDB database for tests that need the query planner, skipped unless MONGO_TEST_URL is set.
+    """
+    if not MONGO_TEST_URL:
+        pytest.skip("MONGO_TEST_URL not set")
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    yield client.index_test_base
+    client.close()
+
+
+def _stages(plan: dict):
+    yield plan.get('stage')
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            yield from _stages(plan[child])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+async def assert_no_collscan(collection, filter: dict, sort=None):
+    """ Fail when the winning plan of the query shape scans the whole collection. """
+    cursor = collection.find(filter)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = (await cursor.explain())['queryPlanner']['winningPlan']
+    stages = list(_stages(plan))
+    assert 'COLLSCAN' not in stages, f"{filter} sorted by {sort} scans the collection: {stages}"
+
+
+def new_ids(n: int) -> list:
+    return [objectid.ObjectId().__str__() for _ in range(n)]
+
+
+class CountingCollection(object):
+    """ Wrap a collection to count the calls of the given methods, the other attributes pass through. """
+
+    def __init__(self, collection, *methods: str):
+        self.collection = collection
+        self.calls = dict.fromkeys(methods, 0)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if name not in self.calls:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase(object):
+    """ Database whose every collection is the same counting wrapper of the named collection. """
+
+    def __init__(self, db, name: str, *methods: str):
+        self.name = db.name
+        self.collection = CountingCollection(db[name], *methods)
+
+    def __getitem__(self, name):
+        return self.collection
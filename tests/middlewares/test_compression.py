@@ -0,0 +1,94 @@
+import asyncio
+import gzip
+import pytest
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from app.middlewares.compression import ENCODERS, CompressionMiddleware, negotiate
+
+_BODY = {"items": [{"name": f"Person {i}", "hobbies": ["Sleeping", "Eating"]} for i in range(200)]}
+
+
+async def _call(app, path="/", accept="gzip", method="GET"):
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+             "headers": [(b"accept-encoding", accept.encode())]}
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    headers = {key.decode(): value.decode() for key, value in messages[0]["headers"]}
+    return headers, [message.get("body", b"") for message in messages[1:]]
+
+
+def _app(response_factory, **kwargs):
+    async def app(scope, receive, send):
+        await response_factory()(scope, receive, send)
+    return CompressionMiddleware(app, **kwargs)
+
+
+def test_negotiate():
+    assert negotiate("gzip, deflate", ["br", "zstd", "gzip"]) == "gzip"
+    assert negotiate("gzip;q=0.5, br;q=0.1", ["br", "gzip"]) == "gzip"
+    assert negotiate("gzip;q=0", ["gzip"]) is None
+    assert negotiate("*", ["gzip"]) == "gzip"
+    assert negotiate("", ["gzip"]) is None
+
+
+async def test_compresses_and_caches_by_etag():
+    middleware = _app(lambda: JSONResponse(_BODY, headers={"ETag": '"v1"'}))
+    headers, bodies = await _call(middleware)
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"] == 'W/"v1"'
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(bodies[0])
+    assert gzip.decompress(bodies[0]) == JSONResponse(_BODY).body
+    await _call(middleware)
+    assert middleware.cache.hits == 1
+
+
+async def test_caches_by_method():
+    middleware = _app(lambda: JSONResponse(_BODY, headers={"ETag": '"v1"'}))
+    await _call(middleware)
+    await _call(middleware, method="HEAD")
+    assert middleware.cache.hits == 0
+
+
+async def test_varies_on_accept_encoding_whatever_the_encoding():
+    middleware = _app(lambda: JSONResponse(_BODY))
+    for accept in ("gzip", "identity", ""):
+        assert (await _call(middleware, accept=accept))[0]["vary"] == "Accept-Encoding"
+    assert (await _call(_app(lambda: JSONResponse({"a": 1}))))[0]["vary"] == "Accept-Encoding"
+    assert "vary" not in (await _call(_app(lambda: Response(b"x" * 2000, media_type="image/png")), accept=""))[0]
+
+
+async def test_leaves_small_encoded_and_binary_responses():
+    small = _app(lambda: JSONResponse({"a": 1}))
+    assert "content-encoding" not in (await _call(small))[0]
+    encoded = _app(lambda: Response(b"x" * 2000, headers={"Content-Encoding": "gzip"}, media_type="text/csv"))
+    assert (await _call(encoded))[1] == [b"x" * 2000]
+    binary = _app(lambda: Response(b"x" * 2000, media_type="image/png"))
+    assert "content-encoding" not in (await _call(binary))[0]
+
+
+async def test_streams_incrementally():
+    async def rows():
+        for i in range(3):
+            yield (f'{{"row": {i}}}\n' * 100).encode()
+
+    middleware = _app(lambda: StreamingResponse(rows(), media_type="application/x-ndjson"))
+    headers, bodies = await _call(middleware)
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert all(bodies[:3])
+    assert gzip.decompress(b"".join(bodies)).decode().count("row") == 300
+
+
+@pytest.mark.parametrize("encoding", sorted(set(ENCODERS) - {"gzip"}))
+async def test_optional_encodings(encoding):
+    middleware = _app(lambda: JSONResponse(_BODY), encodings=[encoding, "gzip"])
+    headers, bodies = await _call(middleware, accept=f"gzip, {encoding}")
+    assert headers["content-encoding"] == encoding
+    assert len(bodies[0]) < len(JSONResponse(_BODY).body)
@@ -0,0 +1,46 @@
+import asyncio
+from app.middlewares.load_shedding import LoadSheddingMiddleware
+from app.storages.pool_monitor import pool_stats
+
+
+async def _call(middleware, path="/v1/person/"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware({"type": "http", "method": "GET", "path": path, "headers": []}, None, send)
+    return messages
+
+
+def _app(release: asyncio.Event):
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+async def test_sheds_beyond_in_flight_limit():
+    release = asyncio.Event()
+    middleware = LoadSheddingMiddleware(_app(release), max_in_flight=1, retry_after=3)
+    served = asyncio.ensure_future(_call(middleware))
+    await asyncio.sleep(0)
+    shed = await _call(middleware)
+    assert shed[0]["status"] == 503
+    assert (b"retry-after", b"3") in shed[0]["headers"]
+    release.set()
+    assert (await served)[0]["status"] == 200
+    assert middleware.in_flight == 0
+    assert (await _call(middleware))[0]["status"] == 200
+
+
+async def test_sheds_when_pool_queue_is_long(monkeypatch):
+    release = asyncio.Event()
+    release.set()
+    middleware = LoadSheddingMiddleware(_app(release), max_pool_waiting=5)
+    monkeypatch.setattr(pool_stats, "waiting", 5)
+    assert (await _call(middleware))[0]["status"] == 503
+    assert (await _call(middleware, path="/metrics"))[0]["status"] == 200
+    monkeypatch.setattr(pool_stats, "waiting", 0)
+    assert (await _call(middleware))[0]["status"] == 200
@@ -38,6 +38,21 @@ async def test_create(db):
     assert valid_json == obj
 
 
+async def test_create_if_missing(db):
+    id = objectid.ObjectId().__str__()
+    assert await repo.create_if_missing({'_id': id, 'name': 'first'}, db) == {'_id': id, 'name': 'first'}
+    assert await repo.create_if_missing({'_id': id, 'name': 'second'}, db) == {'_id': id, 'name': 'first'}
+    assert await db[repo.collection].count_documents({'_id': id}) == 1
+
+
+async def test_update_and_get(db):
+    id = objectid.ObjectId().__str__()
+    await repo.insert({'_id': id, 'name': 'test', 'version': 1}, db)
+    assert await repo.update_and_get(id, {'name': 'stale'}, db, {'version': 2}) is None
+    updated = await repo.update_and_get(id, {'name': 'changed'}, db, {'version': 1}, {'name': 1})
+    assert updated == {'_id': id, 'name': 'changed'}
+
+
 async def test_insert(db):
     valid_json['_id'] = objectid.ObjectId().__str__()  # type: ignore
     id = await repo.insert(valid_json, db)
@@ -67,6 +82,13 @@ async def test_get_one(db):
     assert id == (await repo.get_one({'_id': id}, db))['_id']
 
 
+async def test_get_by_id_with_projection(db):
+    valid_json['_id'] = objectid.ObjectId().__str__()  # type: ignore
+    id = await repo.insert(valid_json, db)
+    assert await repo.get_by_id(id, db, {'name': 1}) == {'_id': id, 'name': 'test'}
+    assert 'name' not in await repo.get_by_id(id, db, {'name': 0})
+
+
 async def test_get_by_with_id(db):
     valid_json['_id'] = objectid.ObjectId().__str__()  # type: ignore
     id = await repo.insert(valid_json, db)
@@ -94,6 +116,13 @@ async def test_get_all(db):
     assert obj == (await repo.get_all(db))[0]
 
 
+async def test_iterate(db):
+    await db[repo.collection].drop()
+    xs = await repo.insert_many(generate_valid_json_list(25), db)
+    ids = [x['_id'] async for x in repo.iterate({'name': 'test'}, db, sort_field='_id', batch_size=10)]
+    assert ids == sorted(xs)
+
+
 async def test_update(db):
     valid_json['_id'] = objectid.ObjectId().__str__()  # type: ignore
     obj = await repo.create(valid_json, db)
@@ -114,6 +143,19 @@ async def test_update_list(db):
     assert len(res_update) == 105
 
 
+async def test_bulk_update_reports_missing_elements(db):
+    await db[repo.collection].drop()
+    xs = generate_valid_json_list(12)
+    await repo.insert_many(xs[:10], db)
+    for x in xs:
+        x['name'] = 'bulk'
+
+    result = await repo.bulk_update(xs, db, ordered=False, chunk_size=5)
+    assert [x['_id'] for x in result['updated']] == [x['_id'] for x in xs[:10]]
+    assert all(x['name'] == 'bulk' for x in result['updated'])
+    assert [(e['index'], e['detail']) for e in result['errors']] == [(10, 'not found'), (11, 'not found')]
+
+
 async def test_delete(db):
     valid_json['_id'] = objectid.ObjectId().__str__()
     obj = await repo.create(valid_json, db)
@@ -130,6 +172,50 @@ async def test_get_by_and_sort_with_pagination(db):
     assert len(await repo.get_by_and_sort_with_pagination({'name': 'test'}, 'name', page=10, per_page=10, db=db)) == 5
 
 
+async def test_get_by_and_sort_with_keyset(db):
+    await db[repo.collection].drop()
+    xs = generate_valid_json_list(25)
+    for i, x in enumerate(xs):
+        x['name'] = f'test{i % 3}'
+    await repo.insert_many(xs, db)
+    expected = [x['_id'] for x in sorted(xs, key=lambda x: (x['name'], x['_id']))]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await repo.get_by_and_sort_with_keyset({}, 'name', 10, db, cursor)
+        seen.extend(x['_id'] for x in page)
+        if cursor is None:
+            break
+    assert seen == expected
+
+    page, cursor = await repo.get_by_and_sort_with_keyset({}, 'name', 10, db, projection={'Diana': 1})
+    assert all(set(x) == {'_id', 'Diana'} for x in page)
+    page, cursor = await repo.get_by_and_sort_with_keyset({}, 'name', 10, db, cursor, projection={'name': 0})
+    assert [x['_id'] for x in page] == expected[10:20]
+    assert all('name' not in x for x in page)
+
+
+async def test_get_by_and_sort_with_keyset_and_count(db):
+    await db[repo.collection].drop()
+    xs = generate_valid_json_list(25)
+    for i, x in enumerate(xs):
+        x['name'] = f'test{i % 2}'
+    await repo.insert_many(xs, db)
+
+    page, cursor, total = await repo.get_by_and_sort_with_keyset_and_count({'name': 'test0'}, 'name', 10, db)
+    assert (len(page), total) == (10, 13)
+    page, cursor, total = await repo.get_by_and_sort_with_keyset_and_count(
+        {'name': 'test0'}, 'name', 10, db, cursor, projection={'name': 1})
+    assert (len(page), cursor, total) == (3, None, 13)
+    assert set(page[0]) == {'_id', 'name'}
+    page, cursor, total = await repo.get_by_and_sort_with_keyset_and_count(
+        {'name': 'test0'}, 'name', 10, db, projection={'Diana': 1})
+    assert set(page[0]) == {'_id', 'Diana'}
+
+    page, cursor, total = await repo.get_by_and_sort_with_keyset_and_count({}, '_id', 10, db)
+    assert (len(page), total) == (10, 25)
+
+
 async def test_exists(db):
     valid_json['_id'] = objectid.ObjectId().__str__()  # type: ignore
     id = await repo.insert(valid_json, db)
@@ -0,0 +1,69 @@
+import asyncio
+from bson import objectid
+from app.repositories.base_repository import BaseRepository
+from app.repositories.batch_loader import BatchLoader
+from tests.helpers import CountingDatabase, new_ids
+
+
+async def test_concurrent_lookups_share_one_query(db):
+    repo = BaseRepository('test_batch_loader', loader=BatchLoader('test_batch_loader'))
+    ids = new_ids(3)
+    await repo.insert_many([{'_id': id, 'name': 'test'} for id in ids], db)
+    counting = CountingDatabase(db, repo.collection, 'find')
+
+    elements = await asyncio.gather(*(repo.get_by_id(id, counting) for id in ids + ids + ['missing']))
+    assert [element['_id'] for element in elements[:6]] == ids + ids
+    assert elements[6] is None
+    assert counting.collection.calls['find'] == 1
+    await db[repo.collection].drop()
+
+
+async def test_lookups_are_split_by_max_batch_size(db):
+    repo = BaseRepository('test_batch_loader', loader=BatchLoader('test_batch_loader', max_batch_size=2))
+    counting = CountingDatabase(db, repo.collection, 'find')
+    await asyncio.gather(*(repo.get_by_id(id, counting) for id in new_ids(5)))
+    assert counting.collection.calls['find'] == 3
+
+
+async def test_shared_lookups_return_copies(db):
+    repo = BaseRepository('test_batch_loader', loader=BatchLoader('test_batch_loader'))
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'test'}, db)
+    first, second = await asyncio.gather(repo.get_by_id(id, db), repo.get_by_id(id, db))
+    first['name'] = 'changed'
+    assert second['name'] == 'test'
+    await db[repo.collection].drop()
+
+
+async def test_write_is_seen_by_later_lookup(db):
+    repo = BaseRepository('test_batch_loader', loader=BatchLoader('test_batch_loader'))
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'test'}, db)
+    before = asyncio.ensure_future(repo.get_by_id(id, db))
+    await asyncio.sleep(0)
+    await repo.update(id, {'name': 'changed'}, db)
+    assert (await repo.get_by_id(id, db))['name'] == 'changed'
+    await before
+    await db[repo.collection].drop()
+
+
+async def test_cancelled_fetch_does_not_leave_lookups_waiting(db):
+    class HangingCursor(object):
+        async def to_list(self, length):
+            await asyncio.Event().wait()
+
+    class HangingDatabase(object):
+        name = db.name
+
+        def __getitem__(self, name):
+            class Collection(object):
+                def find(self, *args, **kwargs):
+                    return HangingCursor()
+            return Collection()
+
+    loader = BatchLoader('test_batch_loader')
+    lookup = asyncio.ensure_future(loader.load('a', HangingDatabase()))
+    await asyncio.sleep(0.01)
+    for task in list(loader._tasks):
+        task.cancel()
+    done, _ = await asyncio.wait([lookup], timeout=1)
+    assert done and lookup.cancelled()
+    assert loader._futures == {}
@@ -0,0 +1,90 @@
+import pytest
+from pymongo import ASCENDING, IndexModel
+from app.repositories.base_repository import BaseRepository, _same_index
+from app.repositories.indexes import ensure_all_indexes
+from app.repositories.person_repository import PersonRepository
+from app.repositories.user_repository import UserRepository
+from tests.helpers import assert_no_collscan, mongo_db  # noqa: F401
+
+
+class IndexedRepository(BaseRepository):
+    indexes = [
+        IndexModel([('name', ASCENDING)]),
+        IndexModel([('code', ASCENDING)], unique=True, name='code'),
+    ]
+
+    def __init__(self):
+        super().__init__('test_indexes')
+
+
+async def test_ensure_indexes_is_idempotent(db):
+    repo = IndexedRepository()
+    assert (await repo.ensure_indexes(db))['created'] == ['name_1', 'code']
+    assert (await repo.ensure_indexes(db))['unchanged'] == ['name_1', 'code']
+    await db[repo.collection].drop()
+
+
+async def test_ensure_indexes_rebuilds_changed_definition(db):
+    repo = IndexedRepository()
+    await db[repo.collection].create_index([('code', ASCENDING)], name='code')
+    result = await repo.ensure_indexes(db)
+    assert result['rebuilt'] == ['code']
+    assert (await db[repo.collection].index_information())['code']['unique'] is True
+    await db[repo.collection].drop()
+
+
+async def test_startup_leaves_changed_definition(db):
+    repo = IndexedRepository()
+    await db[repo.collection].create_index([('code', ASCENDING)], name='code')
+    result = await repo.ensure_indexes(db, rebuild=False)
+    assert result == {'created': ['name_1'], 'rebuilt': [], 'outdated': ['code'], 'unchanged': []}
+    assert 'unique' not in (await db[repo.collection].index_information())['code']
+    await db[repo.collection].drop()
+
+
+async def test_ensure_all_indexes(db):
+    results = await ensure_all_indexes(db)
+    assert set(results) == {PersonRepository().collection, UserRepository().collection, 'rate_limit'}
+    assert results[UserRepository().collection]['created'] == ['username_1', 'email_1']
+    assert results['rate_limit']['created'] == ['updated_1']
+    assert (await ensure_all_indexes(db))['rate_limit']['created'] == []
+
+
+@pytest.mark.parametrize('filter,sort', [
+    ({'name': 'Jack'}, None),
+    ({'name': 'Jack'}, [('name', ASCENDING), ('_id', ASCENDING)]),
+    ({'occupation': 'King'}, None),
+    ({'hobbies': 'Sleeping'}, None),
+    ({'friends.name': 'Jill'}, None),
+    ({'age': {'$gte': 18}}, [('age', ASCENDING), ('_id', ASCENDING)]),
+])
+async def test_person_query_shapes_use_indexes(mongo_db, filter, sort):  # noqa: F811
+    repo = PersonRepository()
+    await repo.ensure_indexes(mongo_db)
+    await assert_no_collscan(mongo_db[repo.collection], filter, sort)
+
+
+@pytest.mark.parametrize('filter', [{'username': 'johndoe'}, {'email': 'johndoe@example.com'}])
+async def test_user_query_shapes_use_indexes(mongo_db, filter):  # noqa: F811
+    repo = UserRepository()
+    await repo.ensure_indexes(mongo_db)
+    await assert_no_collscan(mongo_db[repo.collection], filter)
+
+
+def test_text_index_compares_reported_weights():
+    spec = PersonRepository.indexes[-1].document
+    current = {'key': [('_fts', 'text'), ('_ftsx', 1)], 'weights': dict(spec['weights']), 'default_language': 'none'}
+    assert _same_index(current, spec)
+    assert not _same_index(dict(current, weights={'name': 1}), spec)
+    assert not _same_index(dict(current, default_language='english'), spec)
+
+
+async def test_person_text_search_uses_text_index(mongo_db):  # noqa: F811
+    repo = PersonRepository()
+    await repo.ensure_indexes(mongo_db)
+    assert (await repo.ensure_indexes(mongo_db))['unchanged'][-1] == 'person_text'
+    await repo.insert_many([{'_id': 'a', 'name': 'Jack', 'hobbies': ['Sleeping']},
+                            {'_id': 'b', 'name': 'Jill', 'hobbies': ['Jack stories']}], mongo_db)
+    found = await repo._search_text('jack', 0, 10, mongo_db, None)
+    assert [element['_id'] for element in found] == ['a', 'b']
+    await mongo_db[repo.collection].drop()
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from pymongo.errors import DuplicateKeyError
+from app.repositories.base_repository import BaseRepository
+from app.repositories.write_coalescer import WriteCoalescer
+from tests.helpers import CountingDatabase, new_ids
+
+
+async def test_concurrent_inserts_share_one_insert_many(db):
+    repo = BaseRepository('test_write_coalescer', coalescer=WriteCoalescer('test_write_coalescer'))
+    counting = CountingDatabase(db, repo.collection, 'insert_many')
+    ids = new_ids(5)
+    assert await asyncio.gather(*(repo.insert({'_id': id}, counting) for id in ids)) == ids
+    assert counting.collection.calls['insert_many'] == 1
+    assert await db[repo.collection].count_documents({}) == 5
+    await db[repo.collection].drop()
+
+
+async def test_batches_are_split_by_max_batch_size(db):
+    repo = BaseRepository('test_write_coalescer', coalescer=WriteCoalescer('test_write_coalescer', max_batch_size=2))
+    counting = CountingDatabase(db, repo.collection, 'insert_many')
+    await asyncio.gather(*(repo.insert({'_id': id}, counting) for id in new_ids(5)))
+    assert counting.collection.calls['insert_many'] == 3
+    await db[repo.collection].drop()
+
+
+async def test_each_caller_gets_its_own_error(db):
+    repo = BaseRepository('test_write_coalescer', coalescer=WriteCoalescer('test_write_coalescer'))
+    taken, free = new_ids(2)
+    await db[repo.collection].insert_one({'_id': taken})
+    results = await asyncio.gather(repo.insert({'_id': taken}, db), repo.insert({'_id': free}, db),
+                                   return_exceptions=True)
+    assert isinstance(results[0], DuplicateKeyError)
+    assert results[1] == free
+    await db[repo.collection].drop()
+
+
+async def test_create_if_missing_returns_the_stored_element(db):
+    repo = BaseRepository('test_write_coalescer', coalescer=WriteCoalescer('test_write_coalescer'))
+    id = new_ids(1)[0]
+    first, second = await asyncio.gather(repo.create_if_missing({'_id': id, 'name': 'first'}, db),
+                                         repo.create_if_missing({'_id': id, 'name': 'second'}, db))
+    assert first == second == {'_id': id, 'name': 'first'}
+    await db[repo.collection].drop()
+
+
+async def test_failed_batch_fails_every_caller(db):
+    class FailingCollection(object):
+        async def insert_many(self, *args, **kwargs):
+            raise ConnectionError('down')
+
+    class FailingDatabase(object):
+        name = db.name
+
+        def __getitem__(self, name):
+            return FailingCollection()
+
+    coalescer = WriteCoalescer('test_write_coalescer')
+    results = await asyncio.gather(*(coalescer.insert({'_id': id}, FailingDatabase()) for id in new_ids(2)),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    with pytest.raises(ConnectionError):
+        await coalescer.insert({'_id': 'x'}, FailingDatabase())
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from pydantic import BaseModel, Field, StrictStr
+from app.codecs.object_id_codec import ObjectIdCodec
+from app.models.person_model import PersonModel, example as person_example
+from app.repositories.base_repository import BaseRepository
+from app.routes.basic_router import BasicRouter, to_document
+
+
+class ImportModel(BaseModel):
+    id: ObjectIdCodec = Field(default_factory=ObjectIdCodec, alias="_id")
+    name: StrictStr
+
+    class Config:
+        json_encoders = {ObjectId: str}
+
+
+def test_to_document_rounds_datetimes_as_stored():
+    local = datetime(2021, 6, 1, 10, 20, 30, 123456, tzinfo=timezone(timedelta(hours=2)))
+    assert to_document({'at': local, 'at_list': [local]}) == {
+        'at': datetime(2021, 6, 1, 8, 20, 30, 123000),
+        'at_list': [datetime(2021, 6, 1, 8, 20, 30, 123000)],
+    }
+
+
+def test_to_document_leaves_model_encoders_alone():
+    person = PersonModel(**dict(person_example, last_update=datetime(2021, 6, 1, 10, 20, 30, 123456)))
+    document = to_document(person)
+    assert document['last_update'] == datetime(2021, 6, 1, 10, 20, 30, 123000)
+    assert to_document([person]) == [document]
+    assert PersonModel.__config__.json_encoders[datetime] is str
+    assert '2021-06-01 10:20:30.123456' in person.json()
+
+
+async def test_import_ndjson_writes_in_chunks(db):
+    repo = BaseRepository('test_import_ndjson')
+    router = BasicRouter(repo)
+
+    async def body():
+        yield b'{"name": "a"}\n{"na'
+        yield b'me": "b"}\n{"name": 1}\n{"name": "c"}'
+
+    result = await router.import_ndjson(body(), ImportModel, db, chunk_size=2)
+    assert result == {'inserted': 3, 'failed': 1, 'errors': [{'line': 3, 'detail': result['errors'][0]['detail']}]}
+    assert sorted(e['name'] for e in await repo.get_all(db)) == ['a', 'b', 'c']
+    await db[repo.collection].drop()
+
+
+async def test_import_ndjson_fails_long_lines_without_buffering_them(db):
+    repo = BaseRepository('test_import_ndjson')
+    router = BasicRouter(repo)
+
+    async def body():
+        yield b'{"name": "a"}\n{"name": "' + b'x' * 40
+        yield b'x' * 40
+        yield b'x"}\n{"name": "' + b'y' * 40 + b'"}\n{"name": "b"}\n{"name": "' + b'z' * 40
+        yield b'z' * 40
+
+    result = await router.import_ndjson(body(), ImportModel, db, max_line_size=32)
+    assert result['inserted'] == 2
+    assert [error['line'] for error in result['errors']] == [2, 3, 5]
+    assert result['errors'][0]['detail'] == 'Line longer than 32 bytes'
+    assert sorted(e['name'] for e in await repo.get_all(db)) == ['a', 'b']
+    await db[repo.collection].drop()
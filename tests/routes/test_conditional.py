@@ -0,0 +1,24 @@
+from app.routes.conditional import decode_etag, etag_matches, make_etag, make_list_etag, parse_etags, version_now
+
+
+def test_etag_keeps_the_version():
+    version = version_now()
+    assert version.microsecond % 1000 == 0
+    etag = make_etag(version, {'name': 1})
+    assert decode_etag(parse_etags(etag)[0]) == version
+    assert etag != make_etag(version)
+
+
+def test_list_etag_changes_with_versions():
+    elements = [{'_id': 'a', 'v': 1}, {'_id': 'b', 'v': 1}]
+    assert make_list_etag(elements, 'v') == make_list_etag([dict(e) for e in elements], 'v')
+    assert make_list_etag(elements, 'v') != make_list_etag([elements[0], {'_id': 'b', 'v': 2}], 'v')
+    assert make_list_etag(elements, 'v', extra=['cursor', '3']) != make_list_etag(elements, 'v', extra=[None, '3'])
+
+
+def test_etag_matches():
+    etag = make_etag('1')
+    assert etag_matches(f'W/{etag}, "other"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
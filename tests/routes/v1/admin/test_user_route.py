@@ -76,6 +76,18 @@ def test_read_users(client, basic_auth_hash):
     assert response.json() != {}
 
 
+def test_read_users_as_ndjson_stream(client, basic_auth_hash):
+    response = client.get(f'{_BASE_PATH}?stream=ndjson',
+                          headers={
+                              'Authorization': basic_auth_hash,
+                              'x-token': settings.API_TOKEN
+                          })
+    assert response.status_code == 200
+    headers = {'Authorization': basic_auth_hash, 'x-token': settings.API_TOKEN}
+    assert response.text.count('\n') == len(client.get(_BASE_PATH, headers=headers).json())
+    assert 'password' not in response.text
+
+
 def test_read_users_by_fake_id(client, basic_auth_hash):
     response = client.get(f'{_BASE_PATH}fake',
                           headers={
@@ -141,6 +153,20 @@ def test_update_users_twice(client, id, basic_auth_hash):
     assert response.json() != {}
 
 
+def test_update_users_with_if_match(client, id, basic_auth_hash):
+    headers = {'Authorization': basic_auth_hash, 'x-token': settings.API_TOKEN}
+    etag = client.get(f'{_BASE_PATH}{id}', headers=headers).headers['etag']
+    assert client.get(f'{_BASE_PATH}{id}', headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+    response = client.put(f'{_BASE_PATH}{id}', headers={**headers, 'If-Match': etag},
+                          json={'password': 'new_password'})
+    assert response.status_code == 200
+    assert 'password' not in response.json()
+    assert response.headers['etag'] != etag
+    stale = client.put(f'{_BASE_PATH}{id}', headers={**headers, 'If-Match': etag}, json={'password': 'new_password'})
+    assert stale.status_code == 412
+
+
 def test_update_with_empty_pass(client, id, basic_auth_hash):
     basic_request_example_copy = deepcopy(basic_request_example)
     basic_request_example_copy['password'] = ''
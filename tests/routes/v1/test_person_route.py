@@ -1,6 +1,10 @@
+import csv
+import io
+import json
 from typing import AsyncGenerator
 from app.models.person_model import example as valid_json
 from app.repositories.person_repository import PersonRepository
+from app.routes.v1 import person_route
 
 from bson import objectid
 import pytest_asyncio
@@ -23,6 +27,102 @@ def test_read_person(client, id):
     assert response.json() != valid_json
 
 
+def test_read_person_as_ndjson_stream(client, id):
+    response = client.get(f'{_BASE_PATH}?stream=ndjson')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == client.get(f'{_BASE_PATH}').json()
+
+
+def test_read_person_as_json_stream(client, id):
+    response = client.get(f'{_BASE_PATH}?stream=json&hobby=Sleeping')
+    assert response.status_code == 200
+    assert response.json() == client.get(f'{_BASE_PATH}?hobby=Sleeping').json()
+
+
+def test_read_person_with_keyset_pagination(client, id):
+    client.post(f'{_BASE_PATH}', json={**valid_json, '_id': objectid.ObjectId().__str__()})
+    first = client.get(f'{_BASE_PATH}?per_page=1')
+    assert first.status_code == 200
+    assert len(first.json()) == 1
+    second = client.get(f'{_BASE_PATH}?per_page=1&cursor={first.headers["X-Next-Cursor"]}')
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+
+
+def test_read_person_with_total_count(client, id):
+    response = client.get(f'{_BASE_PATH}?per_page=1&with_count=true&hobby=Sleeping')
+    assert response.status_code == 200
+    assert int(response.headers['X-Total-Count']) >= 1
+    response = client.get(f'{_BASE_PATH}?with_count=true')
+    assert int(response.headers['X-Total-Count']) == len(response.json())
+
+
+def test_read_person_with_typed_filters(client):
+    person = {**valid_json, '_id': objectid.ObjectId().__str__(), 'name': 'Typed Filter', 'age': 33,
+              'occupation': 'Typist', 'created_at': '2021-06-01T00:00:00Z'}
+    assert client.post(f'{_BASE_PATH}', json=person).status_code == 201
+
+    def names(query):
+        response = client.get(f'{_BASE_PATH}?{query}')
+        assert response.status_code == 200
+        return [element['name'] for element in response.json()]
+
+    assert 'Typed Filter' in names('age_min=30&age_max=35&name_prefix=Typed')
+    assert 'Typed Filter' not in names('age_min=34&name_prefix=Typed')
+    assert 'Typed Filter' in names('occupation_in=Typist,Painter&created_after=2021-01-01T00:00:00Z')
+    assert 'Typed Filter' not in names('occupation_in=Typist&created_before=2021-01-01T00:00:00Z')
+
+
+def test_read_person_with_invalid_cursor(client, id):
+    response = client.get(f'{_BASE_PATH}?cursor=invalid')
+    assert response.status_code == 400
+
+
+def test_read_person_with_cursor_of_another_sort(client, id):
+    client.post(f'{_BASE_PATH}', json={**valid_json, '_id': objectid.ObjectId().__str__()})
+    cursor = client.get(f'{_BASE_PATH}?per_page=1&sort=name').headers['X-Next-Cursor']
+    assert client.get(f'{_BASE_PATH}?per_page=1&sort=name&cursor={cursor}').status_code == 200
+    response = client.get(f'{_BASE_PATH}?per_page=1&sort=age&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid cursor'
+
+
+def test_read_person_with_fields(client, id):
+    response = client.get(f'{_BASE_PATH}{id}?fields=name,hobbies')
+    assert response.status_code == 200
+    assert response.json()['name'] == valid_json['name']
+    assert response.json()['friends'] is None
+
+
+def test_read_person_page_with_fields_without_the_sort_field(client, id):
+    client.post(f'{_BASE_PATH}', json={**valid_json, '_id': objectid.ObjectId().__str__()})
+    response = client.get(f'{_BASE_PATH}?fields=age&sort=name&per_page=2')
+    assert response.status_code == 200
+    assert [person['name'] for person in response.json()] == [None, None]
+    assert response.json()[0]['age'] == valid_json['age']
+
+
+def test_read_person_with_unknown_fields(client, id):
+    response = client.get(f'{_BASE_PATH}?fields=name,secret')
+    assert response.status_code == 400
+
+
+def test_search_person(client, id):
+    response = client.get(f'{_BASE_PATH}search?q=king sleeping')
+    assert response.status_code == 200
+    assert [person['name'] for person in response.json()] == [valid_json['name']]
+    assert response.json()[0]['score'] > 0
+    assert client.get(f'{_BASE_PATH}search?q=king&page=2').json() == []
+    assert client.get(f'{_BASE_PATH}search?q=nobody').json() == []
+
+
+def test_search_person_without_text(client, id):
+    response = client.get(f'{_BASE_PATH}search')
+    assert response.status_code == 422
+
+
 def test_read_person_by_fake_id(client, id):
     response = client.get('{_BASE_PATH}fake')
     assert response.status_code == 404
@@ -41,6 +141,13 @@ def test_read_person_by_id(client, id):
     assert response.json() != {}
 
 
+def test_read_person_without_response_validation(client, id, monkeypatch):
+    validated = [client.get(f'{_BASE_PATH}{id}').json(), client.get(f'{_BASE_PATH}?hobby=Sleeping').json()]
+    monkeypatch.setattr(person_route._ROUTER, 'validate_responses', False)
+    raw = [client.get(f'{_BASE_PATH}{id}').json(), client.get(f'{_BASE_PATH}?hobby=Sleeping').json()]
+    assert raw == validated
+
+
 def test_update_person(client, id):
     copy_valid_json = valid_json.copy()
     response = client.patch(
@@ -50,6 +157,55 @@ def test_update_person(client, id):
     assert response.json() != {}
 
 
+def test_read_person_not_modified(client, id):
+    etag = client.get(f'{_BASE_PATH}{id}').headers['etag']
+    response = client.get(f'{_BASE_PATH}{id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    assert response.content == b''
+    assert client.get(f'{_BASE_PATH}{id}?fields=name').headers['etag'] != etag
+
+
+def test_read_person_list_not_modified(client, id):
+    response = client.get(f'{_BASE_PATH}?fields=name')
+    assert 'last_update' not in response.json()[0]
+    etag = response.headers['etag']
+    assert client.get(f'{_BASE_PATH}?fields=name', headers={'If-None-Match': etag}).status_code == 304
+    client.patch(f'{_BASE_PATH}{id}', json={'occupation': 'Jester'})
+    assert client.get(f'{_BASE_PATH}?fields=name', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_read_person_page_modified_by_new_element(client):
+    person = dict(valid_json, name='Page Watcher')
+    for _ in range(3):
+        client.post(f'{_BASE_PATH}', json=dict(person, _id=objectid.ObjectId().__str__()))
+    query = f'{_BASE_PATH}?per_page=3&with_count=true&name=Page Watcher'
+    first = client.get(query)
+    assert 'X-Next-Cursor' not in first.headers
+    assert client.get(query, headers={'If-None-Match': first.headers['etag']}).status_code == 304
+    client.post(f'{_BASE_PATH}', json=dict(person, _id=objectid.ObjectId().__str__()))
+    response = client.get(query, headers={'If-None-Match': first.headers['etag']})
+    assert response.status_code == 200
+    assert response.headers['X-Total-Count'] == '4' and 'X-Next-Cursor' in response.headers
+
+
+def test_update_person_with_if_match(client, id):
+    etag = client.get(f'{_BASE_PATH}{id}').headers['etag']
+    response = client.patch(f'{_BASE_PATH}{id}', json={'occupation': 'Jester'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['occupation'] == 'Jester'
+    assert response.headers['etag'] != etag
+    assert response.headers['etag'] == client.get(f'{_BASE_PATH}{id}').headers['etag']
+
+    stale = client.patch(f'{_BASE_PATH}{id}', json={'occupation': 'Knight'}, headers={'If-Match': etag})
+    assert stale.status_code == 412
+    assert client.get(f'{_BASE_PATH}{id}').json()['occupation'] == 'Jester'
+    assert client.patch(f'{_BASE_PATH}{id}', json={'occupation': 'Knight'},
+                        headers={'If-Match': '"garbage"'}).status_code == 412
+    assert client.patch(f'{_BASE_PATH}fake', json={'occupation': 'Knight'},
+                        headers={'If-Match': etag}).status_code == 404
+
+
 def test_update_person_without_content(client, id):
     response = client.patch(f'{_BASE_PATH}{id}')
     assert response.status_code == 422
@@ -63,6 +219,50 @@ def test_write_person(client):
     assert response.status_code == 201
 
 
+def test_write_person_returns_stored_document(client):
+    person = dict(valid_json, _id=objectid.ObjectId().__str__(), last_update='2021-06-01T10:20:30.123456+02:00')
+    created = client.post(f'{_BASE_PATH}', json=person)
+    assert created.status_code == 201
+    again = client.post(f'{_BASE_PATH}', json=dict(person, name='Someone else'))
+    assert again.json() == created.json()
+    assert client.get(f'{_BASE_PATH}{person["_id"]}').json() == created.json()
+
+
+def test_bulk_import_person(client, db):
+    ids = [objectid.ObjectId().__str__() for _ in range(3)]
+    rows = [json.dumps(dict(valid_json, _id=id, name=f'Bulk {i}')) for i, id in enumerate(ids)]
+    body = '\n'.join([rows[0], '{"name": "missing fields"}', '', rows[1], 'not json', rows[0], rows[2]]) + '\n'
+    response = client.post(f'{_BASE_PATH}bulk', content=body, headers={'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    result = response.json()
+    assert result['inserted'] == 3
+    assert result['failed'] == 3
+    assert [error['line'] for error in result['errors']] == [2, 5, 6]
+    assert client.get(f'{_BASE_PATH}{ids[2]}').json()['name'] == 'Bulk 2'
+
+
+def test_export_person_resumes_after_id(client, id):
+    for _ in range(2):
+        client.post(f'{_BASE_PATH}', json=dict(valid_json, _id=objectid.ObjectId().__str__()))
+    response = client.get(f'{_BASE_PATH}export')
+    assert response.status_code == 200
+    assert response.headers['content-disposition'] == 'attachment; filename="person.ndjson"'
+    exported = [json.loads(line)['_id'] for line in response.text.splitlines()]
+    assert exported == sorted(exported) and id in exported and len(exported) >= 3
+    resumed = client.get(f'{_BASE_PATH}export?after={exported[0]}')
+    assert [json.loads(line)['_id'] for line in resumed.text.splitlines()] == exported[1:]
+
+
+def test_export_person_as_gzip_csv(client, id):
+    response = client.get(f'{_BASE_PATH}export?format=csv&compress=gzip&hobby=Sleeping')
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == '_id' and 'hobbies' in rows[0]
+    assert id in [row[0] for row in rows[1:]]
+    assert json.loads(rows[1][rows[0].index('hobbies')]) == valid_json['hobbies']
+
+
 def test_delete_person_fake_id(client):
     response = client.delete(f'{_BASE_PATH}fake')
     assert response.status_code == 404
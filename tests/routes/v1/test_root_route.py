@@ -3,3 +3,18 @@ def test_catch_all(client):
     response = client.get('/')
     assert response.status_code == 200
     assert response.json() == {'message': 'running...'}
+
+
+def test_pool_status(client):
+    response = client.get('/status/pool')
+    assert response.status_code == 200
+    assert 'checked_out' in response.json()
+
+
+def test_metrics(client):
+    client.get('/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert 'http_requests_in_flight' in response.text
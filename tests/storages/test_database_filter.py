@@ -1,4 +1,7 @@
-from app.storages.database_filter import format_to_database_filter
+from datetime import datetime
+import pytest
+from app.storages.database_filter import (decode_cursor, encode_cursor, format_fields_to_projection,
+                                          format_keyset_to_filter, format_to_database_filter)
 
 
 def test_deve_formar_dado_aninhado():
@@ -23,3 +26,43 @@ def test_dados_incorretos_devem_retornar_vazio():
     query = {'obj1': {'obj2': {}}}
     resultado = format_to_database_filter(query)
     assert resultado == {}
+
+
+def test_cursor_deve_preservar_tipos():
+    data = datetime(2020, 1, 1, 10, 30)
+    assert decode_cursor(encode_cursor('created_at', 1, data, 'abc'), 'created_at', 1) == (data, 'abc')
+
+
+def test_cursor_invalido_deve_falhar():
+    with pytest.raises(ValueError):
+        decode_cursor('nao-e-um-cursor', 'name', 1)
+
+
+def test_cursor_de_outra_ordenacao_deve_falhar():
+    cursor = encode_cursor('name', 1, 'P1', 'abc')
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'age', 1)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'name', -1)
+
+
+def test_keyset_deve_combinar_com_filtro():
+    resultado = format_keyset_to_filter({'name': 'a'}, 'age', 1, 10, 'id1')
+    assert resultado == {'$and': [
+        {'name': 'a'},
+        {'$or': [{'age': {'$gt': 10}}, {'age': 10, '_id': {'$gt': 'id1'}}]},
+    ]}
+
+
+def test_keyset_por_id_deve_usar_somente_id():
+    assert format_keyset_to_filter({}, '_id', -1, 'id1', 'id1') == {'_id': {'$lt': 'id1'}}
+
+
+def test_campos_devem_virar_projecao():
+    assert format_fields_to_projection('name, age', {'name', 'age'}) == {'name': 1, 'age': 1}
+    assert format_fields_to_projection(None, {'name'}) is None
+
+
+def test_campo_desconhecido_deve_falhar():
+    with pytest.raises(ValueError):
+        format_fields_to_projection('name,password', {'name'})
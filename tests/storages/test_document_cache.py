@@ -0,0 +1,113 @@
+import asyncio
+from bson import objectid
+from app.repositories.base_repository import BaseRepository
+from app.storages.document_cache import MemoryCacheBackend
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCacheBackend(max_size=2, ttl=60)
+    cache.set('a', {'v': 1})
+    cache.set('b', {'v': 2})
+    assert cache.get('a') == {'v': 1}
+    cache.set('c', {'v': 3})
+    assert cache.get('b') is None
+    assert cache.stats() == {'size': 2, 'max_size': 2, 'hits': 1, 'misses': 1, 'evictions': 1, 'expirations': 0}
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCacheBackend(max_size=2, ttl=0.000001)
+    cache.set('a', {'v': 1})
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_memory_cache_returns_copies():
+    cache = MemoryCacheBackend(max_size=2, ttl=60)
+    cache.set('a', {'v': [1]})
+    cache.get('a')['v'].append(2)
+    assert cache.get('a') == {'v': [1]}
+
+
+async def test_repository_reads_through_and_invalidates(db):
+    cache = MemoryCacheBackend(max_size=10, ttl=60)
+    repo = BaseRepository('test_document_cache', cache)
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'test'}, db)
+
+    assert (await repo.get_by_id(id, db))['name'] == 'test'
+    assert (await repo.get_by_id(id, db))['name'] == 'test'
+    assert cache.stats()['hits'] == 1
+
+    await repo.update(id, {'name': 'changed'}, db)
+    assert (await repo.get_by_id(id, db))['name'] == 'changed'
+
+    await repo.bulk_update([{'_id': id, 'name': 'bulk'}], db)
+    assert (await repo.get_by_id(id, db))['name'] == 'bulk'
+
+    await repo.delete(id, db)
+    assert await repo.get_by_id(id, db) is None
+    await db[repo.collection].drop()
+
+
+async def test_repository_projects_cached_elements(db):
+    cache = MemoryCacheBackend(max_size=10, ttl=60)
+    repo = BaseRepository('test_document_cache', cache)
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'test', 'password': 'secret'}, db)
+
+    assert await repo.get_by_id(id, db, {'password': 0}) == {'_id': id, 'name': 'test'}
+    assert await repo.get_by_id(id, db, {'name': 1}) == {'_id': id, 'name': 'test'}
+    assert await repo.get_by_id(id, db, {'name': 1, '_id': 0}) == {'name': 'test'}
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+    assert (await repo.get_by_id(id, db))['password'] == 'secret'
+    await db[repo.collection].drop()
+
+
+async def test_repository_writes_through(db):
+    cache = MemoryCacheBackend(max_size=10, ttl=60)
+    repo = BaseRepository('test_document_cache', cache)
+    id = objectid.ObjectId().__str__()
+
+    assert await repo.create({'_id': id, 'name': 'test'}, db) == {'_id': id, 'name': 'test'}
+    assert (await repo.get_by_id(id, db))['name'] == 'test'
+    assert (await repo.update_and_get(id, {'name': 'changed'}, db))['name'] == 'changed'
+    assert (await repo.get_by_id(id, db))['name'] == 'changed'
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 0
+    await db[repo.collection].drop()
+
+
+async def test_read_in_flight_does_not_cache_an_invalidated_document(db):
+    class SlowCollection(object):
+        """ Delay find_one until released so a write can land while the read is in flight. """
+
+        def __init__(self, collection):
+            self.collection = collection
+            self.release = asyncio.Event()
+
+        async def find_one(self, *args, **kwargs):
+            element = await self.collection.find_one(*args, **kwargs)
+            await self.release.wait()
+            return element
+
+        def __getattr__(self, name):
+            return getattr(self.collection, name)
+
+    class SlowDatabase(object):
+        def __init__(self):
+            self.name = db.name
+            self.collection = SlowCollection(db['test_document_cache'])
+
+        def __getitem__(self, name):
+            return self.collection
+
+    cache = MemoryCacheBackend(max_size=10, ttl=60)
+    repo = BaseRepository('test_document_cache', cache)
+    slow = SlowDatabase()
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'old'}, db)
+
+    read = asyncio.ensure_future(repo.get_by_id(id, slow))
+    await asyncio.sleep(0)
+    await repo.update(id, {'name': 'new'}, db)
+    slow.collection.release.set()
+    assert (await read)['name'] == 'old'
+    assert (await repo.get_by_id(id, db))['name'] == 'new'
+    assert cache.stats()['size'] == 1
+    await db[repo.collection].drop()
@@ -0,0 +1,42 @@
+from datetime import datetime
+from app.models.person_model import PersonFilterModel
+from app.storages.filter_compiler import FilterCompiler
+
+_COMPILER = FilterCompiler(PersonFilterModel)
+
+
+def test_compile_uses_declared_paths():
+    filter = PersonFilterModel(name='Jack', hobby='Sleeping', friend_name='Jill')
+    assert _COMPILER.compile(filter) == {'name': 'Jack', 'hobbies': 'Sleeping', 'friends.name': 'Jill'}
+
+
+def test_compile_keeps_fields_dropped_by_the_nested_model():
+    date = datetime(2020, 1, 1)
+    filter = PersonFilterModel(created_at=date, last_update=date)
+    assert _COMPILER.compile(filter) == {'created_at': date, 'last_update': date}
+
+
+def test_compile_empty_filter():
+    assert _COMPILER.compile(PersonFilterModel()) == {}
+
+
+def test_compile_merges_ranges_on_the_same_path():
+    after, before = datetime(2020, 1, 1), datetime(2021, 1, 1)
+    filter = PersonFilterModel(age_min=18, age_max=30, created_after=after, created_before=before)
+    assert _COMPILER.compile(filter) == {
+        'age': {'$gte': 18, '$lte': 30},
+        'created_at': {'$gte': after, '$lt': before},
+    }
+
+
+def test_compile_equality_with_range():
+    assert _COMPILER.compile(PersonFilterModel(age=20, age_min=18)) == {'age': {'$eq': 20, '$gte': 18}}
+
+
+def test_compile_in_lists_and_anchored_prefix():
+    filter = PersonFilterModel(occupation_in='King, Queen', hobby_in='Eating', name_prefix='Jack.')
+    assert _COMPILER.compile(filter) == {
+        'occupation': {'$in': ['King', 'Queen']},
+        'hobbies': {'$in': ['Eating']},
+        'name': {'$regex': '^Jack\\.'},
+    }
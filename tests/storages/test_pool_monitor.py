@@ -0,0 +1,24 @@
+from pymongo import monitoring
+from app.storages.pool_monitor import PoolStatsListener
+
+_ADDRESS = ('localhost', 27017)
+
+
+def test_pool_stats_track_checkouts_and_waits():
+    listener = PoolStatsListener()
+    listener.connection_created(monitoring.ConnectionCreatedEvent(_ADDRESS, 1))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(_ADDRESS))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(_ADDRESS))
+    assert listener.stats()['waiting'] == 2
+
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(_ADDRESS, 1, 0.2))
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(_ADDRESS, 'timeout', 0.4))
+    stats = listener.stats()
+    assert stats['open'] == 1
+    assert stats['checked_out'] == 1
+    assert stats['waiting'] == 0
+    assert stats['checkout_failures'] == 1
+    assert stats['wait_time_max'] == 0.4
+
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(_ADDRESS, 1))
+    assert listener.stats()['checked_out'] == 0
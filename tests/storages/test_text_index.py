@@ -0,0 +1,95 @@
+import asyncio
+from bson import objectid
+from app.repositories.base_repository import BaseRepository
+from app.storages.text_index import InvertedIndex, MemoryTextSearch, tokenize
+
+_WEIGHTS = {'name': 10, 'hobbies': 1}
+
+
+def test_tokenize():
+    assert tokenize("Jack of-all Trades!") == ['jack', 'of', 'all', 'trades']
+
+
+def test_inverted_index_ranks_by_weight():
+    index = InvertedIndex(_WEIGHTS)
+    index.add({'_id': 'a', 'name': 'Jack', 'hobbies': ['Sleeping']})
+    index.add({'_id': 'b', 'name': 'Jill', 'hobbies': ['Jack stories']})
+    index.add({'_id': 'c', 'name': 'Jane'})
+    assert [id for id, _ in index.search('jack', 10)] == ['a', 'b']
+    assert index.search('nobody', 10) == []
+
+
+def test_inverted_index_replaces_and_removes():
+    index = InvertedIndex(_WEIGHTS)
+    index.add({'_id': 'a', 'name': 'Jack'})
+    index.add({'_id': 'a', 'name': 'Jill'})
+    assert index.search('jack', 10) == []
+    index.remove('a')
+    assert len(index) == 0
+    assert index.search('jill', 10) == []
+
+
+async def test_repository_search_follows_writes(db):
+    repo = BaseRepository('test_text_index', text_search=MemoryTextSearch('test_text_index', _WEIGHTS))
+    ids = [objectid.ObjectId().__str__() for _ in range(3)]
+    await repo.insert_many([{'_id': ids[0], 'name': 'Jack', 'hobbies': ['Sleeping']},
+                            {'_id': ids[1], 'name': 'Jill', 'hobbies': ['Jack stories']}], db)
+    found = await repo.search('jack', 1, 10, db)
+    assert [element['_id'] for element in found] == ids[:2]
+    assert found[0]['score'] > found[1]['score']
+    assert [element['_id'] for element in await repo.search('jack', 2, 1, db)] == [ids[1]]
+
+    await repo.insert({'_id': ids[2], 'name': 'Jack Jack'}, db)
+    await repo.update(ids[0], {'name': 'Jane'}, db)
+    await repo.delete(ids[1], db)
+    assert [element['_id'] for element in await repo.search('jack', 1, 10, db)] == [ids[2]]
+    await repo.delete_many({}, db)
+    assert await repo.search('jack', 1, 10, db) == []
+    await db[repo.collection].drop()
+
+
+async def test_writes_during_the_first_build_are_indexed(db):
+    class SlowCursor(object):
+        def __init__(self, cursor, release):
+            self.cursor = cursor.__aiter__()
+            self.release = release
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            element = await self.cursor.__anext__()
+            await self.release.wait()
+            return element
+
+    class SlowDatabase(object):
+        """ Hold every document of the index build scan after it was read, until released. """
+
+        def __init__(self):
+            self.name = db.name
+            self.release = asyncio.Event()
+
+        def __getitem__(self, name):
+            collection = db[name]
+            release = self.release
+
+            class Collection(object):
+                def find(self, *args, **kwargs):
+                    return SlowCursor(collection.find(*args, **kwargs), release)
+
+                def __getattr__(self, attribute):
+                    return getattr(collection, attribute)
+            return Collection()
+
+    search = MemoryTextSearch('test_text_index', _WEIGHTS)
+    repo = BaseRepository('test_text_index', text_search=search)
+    id = await repo.insert({'_id': objectid.ObjectId().__str__(), 'name': 'Jack'}, db)
+    slow = SlowDatabase()
+    building = asyncio.ensure_future(search.search(slow, 'jack', 10))
+    await asyncio.sleep(0)
+    await repo.update(id, {'name': 'Jill'}, db)
+    slow.release.set()
+    await building
+    assert [found for found, _ in await search.search(db, 'jill', 10)] == [id]
+    assert await search.search(db, 'jack', 10) == []
+    await db[repo.collection].drop()
@@ -0,0 +1,19 @@
+import gc
+import importlib.util
+import os
+
+_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn_conf.py")
+
+
+def test_preloading_master_collects_again_once_ready(monkeypatch, tmp_path):
+    monkeypatch.setenv("PRELOAD_APP", "true")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("gunicorn_conf_test", _CONF)
+    conf = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(conf)
+        assert not gc.isenabled()
+        conf.when_ready(None)
+        assert gc.isenabled()
+    finally:
+        gc.enable()
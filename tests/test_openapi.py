@@ -0,0 +1,20 @@
+import json
+from app.main import get_application
+from app.openapi import load_schema, write_schema
+
+
+def test_prebuilt_schema_is_served(tmp_path):
+    path = tmp_path / "openapi.json"
+    write_schema(get_application(), str(path))
+    app = get_application()
+    assert load_schema(app, str(path))
+    assert app.openapi() == json.loads(path.read_text())
+
+
+def test_stale_or_missing_schema_is_ignored(tmp_path):
+    path = tmp_path / "openapi.json"
+    path.write_text(json.dumps({"openapi": "3.0.2", "paths": {"/gone": {}}}))
+    app = get_application()
+    assert not load_schema(app, str(path))
+    assert not load_schema(app, str(tmp_path / "missing.json"))
+    assert "/v1/person/" in app.openapi()["paths"]